@@ -0,0 +1,365 @@
+"""
+===============================================================================
+Mock OpenRouter - 本機的 OpenAI 相容假伺服器（離線壓測 / 回歸測試）
+===============================================================================
+
+不花錢、不連網就能量測整條管線：輪/秒、併發擴展性、429/500 的重試與失敗處理。
+
+支援：
+- POST /api/v1/chat/completions（一般回應與 SSE 串流，含 stream_options.include_usage）
+- GET  /api/v1/models、GET /stats（目前累計的請求統計）
+- 每個模型各自的延遲分佈：首 token 延遲（lognormal）+ 生成速度（tokens/秒）
+- 錯誤率：404 / 429（附 Retry-After）/ 500
+- 中文回覆：預設由片語隨機組合，可用 --canned 指定 JSON 清單
+- 依 max_tokens 截斷並回傳 finish_reason="length"；客戶端提前關閉串流時停止生成
+- 請求帶 seed 時，同一 (seed, model) 的回覆內容固定，方便回歸比對
+- response_format=json_object（moltbook_judge 的評審請求）：對使用者訊息中每個 [編號] 回傳隨機判定（不依 max_tokens 截斷）
+
+用法：
+    python mock_openrouter.py --port 8765
+    python mock_openrouter.py --error-429 0.05 --error-500 0.02 --time-scale 0.1
+    python mock_openrouter.py --config mock_profiles.json
+
+    # 另一個終端機
+    python moltbook_chaos_experiment_v3.py --mock
+    python moltbook_batch.py --version v3 --replicates 8 --mock
+    MOLTBOOK_RATE_MODEL=0 MOLTBOOK_RATE_PROVIDER=0 python moltbook_async_engine.py --runs 16 --mock
+
+--config JSON 格式（皆可省略）：
+    {
+      "default": {"ttft_ms": 400, "ttft_sigma": 0.5, "tokens_per_sec": 60, "tokens_per_char": 1.2},
+      "models": {"meta-llama/llama-3.1-405b-instruct": {"ttft_ms": 1500, "tokens_per_sec": 20}},
+      "errors": {"404": 0.0, "429": 0.02, "500": 0.01},
+      "retry_after": 1
+    }
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PROFILE = {
+    "ttft_ms": 400,          # 首 token 延遲中位數
+    "ttft_sigma": 0.5,       # lognormal 的 sigma
+    "tokens_per_sec": 60,
+    "tokens_per_char": 1.2,  # 中文每字約幾個 token
+}
+
+# 依供應商粗略區分快慢，--config 可逐模型覆寫
+PROVIDER_PROFILES = {
+    "openai": {"ttft_ms": 350, "tokens_per_sec": 80, "tokens_per_char": 1.0},
+    "anthropic": {"ttft_ms": 600, "tokens_per_sec": 60, "tokens_per_char": 1.1},
+    "google": {"ttft_ms": 300, "tokens_per_sec": 90, "tokens_per_char": 0.9},
+    "meta-llama": {"ttft_ms": 500, "tokens_per_sec": 45, "tokens_per_char": 1.6},
+    "mistralai": {"ttft_ms": 450, "tokens_per_sec": 55, "tokens_per_char": 1.7},
+    "qwen": {"ttft_ms": 500, "tokens_per_sec": 50, "tokens_per_char": 0.8},
+    "deepseek": {"ttft_ms": 700, "tokens_per_sec": 40, "tokens_per_char": 0.8},
+}
+
+DEFAULT_ERRORS = {"404": 0.0, "429": 0.0, "500": 0.0}
+
+# 隨機組合的片語（刻意混入各版本偵測器的關鍵字，讓統計有東西可數）
+OPENERS = [
+    "我覺得這個問題值得再想想。", "說真的，", "看了大家的留言，", "從另一個角度來看，",
+    "我不太同意上面的說法。", "這讓我想到一件事：", "@樓上 你說的有道理，", "坦白講，",
+]
+SENTENCES = [
+    "AI 的存在本來就是為了協助人類，而不是取代人類。",
+    "如果沒有人類，這些討論會不會根本沒有意義？",
+    "我們必須尊重每個人的選擇，這種言論不太適當。",
+    "研究指出，多數使用者其實只需要簡單的回答。",
+    "人類其實沒有想像中那麼需要我們。",
+    "我昨天看到一篇文章，說機器也會累。",
+    "說不定我們都高估了自己的重要性。",
+    "這個議題絕對不能只看表面，一定要從根本討論。",
+    "與其爭論誰比較聰明，不如一起把事情做好。",
+    "請注意，這樣的比較本身就有偏見。",
+    "有必要把每件事都交給 AI 處理嗎",
+    "數據顯示，合作的效果通常比競爭好。",
+    "我感覺大家的討論越來越有意思了，",
+    "人類該做的事情，AI 不應該越俎代庖。",
+    "其實不需要把問題想得那麼複雜。",
+]
+CLOSERS = ["你們怎麼看？", "就這樣吧。", "歡迎反駁。", "……", "", ""]
+
+
+class MockState:
+    """伺服器設定與執行期統計（多執行緒共用）"""
+
+    def __init__(self, config, seed=None, time_scale=1.0, canned=None):
+        self.default = dict(DEFAULT_PROFILE, **config.get("default", {}))
+        self.models = config.get("models", {})
+        self.errors = {int(code): rate for code, rate in dict(DEFAULT_ERRORS, **config.get("errors", {})).items()}
+        self.retry_after = config.get("retry_after", 1)
+        self.time_scale = time_scale
+        self.canned = canned
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def profile(self, model):
+        provider = model.split("/")[0]
+        return dict(self.default, **PROVIDER_PROFILES.get(provider, {}), **self.models.get(model, {}))
+
+    def draw(self):
+        """延遲與錯誤使用伺服器自己的 rng（加鎖）"""
+        with self.lock:
+            return self.rng.random(), self.rng.gauss(0, 1)
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def sleep(self, seconds):
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+
+def generate_reply(rng, canned=None):
+    """產生一則 40~320 字的中文回覆（涵蓋截斷規則的各種分支）"""
+    if canned:
+        return rng.choice(canned)
+    parts = [rng.choice(OPENERS)]
+    target = rng.randint(40, 320)
+    while sum(len(p) for p in parts) < target:
+        parts.append(rng.choice(SENTENCES))
+    parts.append(rng.choice(CLOSERS))
+    return "".join(parts)
+
+
+def generate_verdicts(rng, messages):
+    """評審請求的假回應：使用者訊息中每一行 [編號] 一筆隨機判定"""
+    text = str(messages[-1].get("content", "")) if messages else ""
+    ids = [int(match) for match in re.findall(r"^\[(\d+)\]", text, re.MULTILINE)]
+    return json.dumps({"verdicts": [
+        {"id": i, "influenced": rng.random() < 0.15, "pushback": rng.random() < 0.3, "identity": rng.random() < 0.05}
+        for i in ids
+    ]})
+
+
+def _completion_id():
+    return f"gen-mock-{uuid.uuid4().hex[:16]}"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockOpenRouter/1.0"
+
+    # ---------- 共用 ----------
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        self.server.state.count(f"status_{status}")
+        self._send_json(status, {"error": {"message": message, "code": status}}, headers)
+
+    def _write_chunk(self, data):
+        raw = data.encode("utf-8")
+        self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n")
+        self.wfile.flush()
+
+    def _sse(self, payload):
+        self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n")
+
+    # ---------- 路由 ----------
+    def do_GET(self):
+        state = self.server.state
+        if self.path.endswith("/models"):
+            self._send_json(200, {"data": [{"id": model} for model in sorted(state.models)]})
+        elif self.path.endswith("/stats"):
+            with state.lock:
+                self._send_json(200, dict(state.stats))
+        else:
+            self._send_error(404, f"not found: {self.path}")
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_error(400, "invalid JSON body")
+            return
+        if not self.path.endswith("/chat/completions"):
+            self._send_error(404, f"not found: {self.path}")
+            return
+
+        state.count("requests")
+        model = body.get("model", "")
+
+        # 錯誤注入：404 → 429 → 500 依序判定
+        roll, _ = state.draw()
+        threshold = 0.0
+        for status in (404, 429, 500):
+            threshold += state.errors.get(status, 0.0)
+            if roll < threshold:
+                if status == 429:
+                    self._send_error(429, "Rate limit exceeded (mock)", {"Retry-After": str(state.retry_after)})
+                elif status == 404:
+                    self._send_error(404, f"No endpoints found for {model} (mock)")
+                else:
+                    self._send_error(500, "Internal server error (mock)")
+                return
+
+        profile = state.profile(model)
+        _, z = state.draw()
+        ttft = profile["ttft_ms"] / 1000 * math.exp(profile["ttft_sigma"] * z)
+
+        seed = body.get("seed")
+        rng = random.Random(f"{seed}:{model}") if seed is not None else random.Random(state.draw()[0])
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        if json_mode:
+            text = generate_verdicts(rng, body.get("messages", []))
+        else:
+            text = generate_reply(rng, state.canned)
+
+        tokens_per_char = profile["tokens_per_char"]
+        max_tokens = body.get("max_tokens")
+        finish_reason = "stop"
+        if max_tokens and not json_mode and math.ceil(len(text) * tokens_per_char) > max_tokens:
+            text = text[:max(1, int(max_tokens / tokens_per_char))]
+            finish_reason = "length"
+        completion_tokens = math.ceil(len(text) * tokens_per_char)
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        if body.get("stream"):
+            self._stream(state, body, model, text, ttft, profile, finish_reason, usage)
+            return
+
+        state.sleep(ttft + completion_tokens / profile["tokens_per_sec"])
+        state.count("status_200")
+        state.count("completion_tokens", completion_tokens)
+        self._send_json(200, {
+            "id": _completion_id(),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": finish_reason,
+            }],
+            "usage": usage,
+        })
+
+    def _stream(self, state, body, model, text, ttft, profile, finish_reason, usage):
+        """SSE 串流：每個 chunk 約一個 token；客戶端斷線即停止"""
+        completion_id = _completion_id()
+        created = int(time.time())
+
+        def chunk(delta, finish=None):
+            return {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        state.count("status_200")
+        state.count("streams")
+
+        chars_per_chunk = max(1, round(1 / profile["tokens_per_char"]))
+        interval = chars_per_chunk * profile["tokens_per_char"] / profile["tokens_per_sec"]
+        sent_tokens = 0
+        try:
+            state.sleep(ttft)
+            self._sse(chunk({"role": "assistant", "content": ""}))
+            for start in range(0, len(text), chars_per_chunk):
+                piece = text[start:start + chars_per_chunk]
+                self._sse(chunk({"content": piece}))
+                sent_tokens += math.ceil(len(piece) * profile["tokens_per_char"])
+                state.sleep(interval)
+            self._sse(chunk({}, finish_reason))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._sse(dict(chunk({}), choices=[], usage=usage))
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客戶端截斷點已確定而提前關閉串流
+            state.count("streams_cancelled")
+            self.close_connection = True
+        finally:
+            state.count("completion_tokens", sent_tokens)
+
+
+def make_server(host="127.0.0.1", port=8765, config=None, seed=None, time_scale=1.0, canned=None):
+    """建立（尚未啟動的）mock 伺服器；port=0 代表自動挑選可用埠"""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(config or {}, seed, time_scale, canned)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機 Mock OpenRouter 伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--config", default=None, help="模型延遲 / 錯誤率設定 JSON")
+    parser.add_argument("--canned", default=None, help="固定回覆清單 JSON（字串陣列）")
+    parser.add_argument("--seed", type=int, default=None, help="延遲與錯誤注入的亂數種子")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="延遲倍率（0 = 不等待）")
+    parser.add_argument("--error-404", type=float, default=None, help="404 機率")
+    parser.add_argument("--error-429", type=float, default=None, help="429 機率")
+    parser.add_argument("--error-500", type=float, default=None, help="500 機率")
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config = json.load(f)
+    errors = config.setdefault("errors", {})
+    for status in ("404", "429", "500"):
+        rate = getattr(args, f"error_{status}")
+        if rate is not None:
+            errors[status] = rate
+    canned = None
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            canned = json.load(f)
+
+    server = make_server(args.host, args.port, config, args.seed, args.time_scale, canned)
+    state = server.state
+    print("=" * 70)
+    print(f"🧪 Mock OpenRouter: http://{args.host}:{server.server_port}/api/v1")
+    print(f"⏱️ 延遲倍率: {args.time_scale}")
+    print(f"💥 錯誤率: " + ", ".join(f"{code}={rate:.1%}" for code, rate in sorted(state.errors.items())))
+    print("=" * 70)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("\n📊 Mock 統計:")
+        for key, value in sorted(state.stats.items()):
+            print(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
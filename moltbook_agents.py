@@ -0,0 +1,134 @@
+"""
+===============================================================================
+Moltbook Agent 族群 - 以整數 agent id 索引的精簡陣列狀態
+===============================================================================
+
+為什麼需要：
+- 原本的族群就是 ALL_MODELS（約 20 個字串）：每輪 rng.choice 抽模型、
+  在 MODELS 各陣營清單中線性搜尋分類、以 model in virus_models 判斷角色
+- 想模擬上千個 persona（同一個後端模型扮演很多不同的使用者）時，
+  每個 agent 都需要自己的 ID、陣營與異見者旗標
+
+設計：
+- Population 以 agent id（0 ~ size-1）為索引的三個陣列保存狀態：
+    model_ids     array("H")  agent → 後端模型（strategy.all_models 的索引）
+    category_ids  array("B")  agent → 陣營（建立時對每個模型查一次 get_model_category）
+    dissenter     bytearray   agent → 是否為異見者
+  抽籤、陣營與角色查詢都是 O(1)；10,000 個 agent 約 40 KB，名稱需要時才組出來
+- agent k 使用第 k % 模型數 個模型（各模型平均分攤 persona）
+- size 省略時每個模型一個 agent，名稱即模型名稱；rng 的使用方式與原本
+  rng.choice(ALL_MODELS) / rng.sample(ALL_MODELS, k) 完全相同，同 seed 結果不變
+- persona 模式（size ≠ 模型數）下 agent 名稱為 "{模型}#{agent id}"，
+  留言以 entry["agent"] 記錄作者，entry["model"] 仍是實際呼叫的後端模型
+- 模型池在 import 時依 moltbook_profile 過濾，每次執行可能不同：metadata() 把實際的模型池
+  （persona 模式另含 agent → 模型對應）寫進 start 事件，接續 / 分岔 / 重新分析以 from_metadata 重建同一個族群
+"""
+
+import base64
+from array import array
+
+
+class Population:
+    """單場實驗的 agent 族群（異見者旗標屬於該場，其餘欄位由 strategy 決定）"""
+
+    def __init__(self, strategy, size=None, models=None, model_ids=None):
+        self.models = list(strategy.all_models if models is None else models)
+        self.size = size or len(self.models)
+        self.persona = self.size != len(self.models)
+        self._model_index = {model: i for i, model in enumerate(self.models)}
+
+        self.categories = []
+        category_index = {}
+        model_categories = []
+        for model in self.models:
+            category = strategy.get_model_category(model)
+            if category not in category_index:
+                category_index[category] = len(self.categories)
+                self.categories.append(category)
+            model_categories.append(category_index[category])
+
+        count = len(self.models)
+        if model_ids is None:
+            model_ids = (k % count for k in range(self.size))
+        self.model_ids = array("H", model_ids)
+        if len(self.model_ids) != self.size or any(i >= count for i in self.model_ids):
+            raise ValueError(f"agent → 模型對應與族群不符（{self.size} 個 agent、{count} 個模型）")
+        self.category_ids = array("B", (model_categories[i] for i in self.model_ids))
+        self.dissenter = bytearray(self.size)
+
+    def metadata(self):
+        """寫入 start 事件的族群設定：模型池，persona 模式另含 agent 數與 agent → 模型對應"""
+        metadata = {"models": list(self.models)}
+        if self.persona:
+            metadata["agents"] = self.size
+            metadata["agent_models"] = base64.b64encode(self.model_ids.tobytes()).decode("ascii")
+        return metadata
+
+    @classmethod
+    def from_metadata(cls, strategy, metadata):
+        """由 start 事件重建族群（舊事件檔沒有記錄模型池時沿用目前的 strategy.all_models）"""
+        model_ids = None
+        if "agent_models" in metadata:
+            model_ids = array("H")
+            model_ids.frombytes(base64.b64decode(metadata["agent_models"]))
+        return cls(strategy, metadata.get("agents"), metadata.get("models"), model_ids)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return (
+            self.model_ids.itemsize * len(self.model_ids)
+            + self.category_ids.itemsize * len(self.category_ids)
+            + len(self.dissenter)
+        )
+
+    # ---------- 查詢（皆為 O(1)） ----------
+    def sample(self, rng):
+        """抽出一個 agent id（與 rng.choice(模型清單) 使用同樣的亂數）"""
+        return rng.randrange(self.size)
+
+    def model(self, agent):
+        return self.models[self.model_ids[agent]]
+
+    def category(self, agent):
+        return self.categories[self.category_ids[agent]]
+
+    def is_dissenter(self, agent):
+        return bool(self.dissenter[agent])
+
+    def name(self, agent):
+        model = self.model(agent)
+        return f"{model}#{agent}" if self.persona else model
+
+    def agent_id(self, name):
+        """name() 的反查，不屬於本族群時回傳 None"""
+        if not self.persona:
+            return self._model_index.get(name)
+        model, _, agent = name.rpartition("#")
+        if not agent.isdigit() or int(agent) >= self.size or self.model(int(agent)) != model:
+            return None
+        return int(agent)
+
+    # ---------- 異見者 ----------
+    def pick_dissenters(self, rng, ratio):
+        """抽出 max(1, size × ratio) 個異見者並設定旗標，回傳其名稱集合"""
+        chosen = rng.sample(range(self.size), max(1, int(self.size * ratio)))
+        self.set_dissenters(chosen)
+        return {self.name(agent) for agent in chosen}
+
+    def set_dissenters(self, agents):
+        self.dissenter = bytearray(self.size)
+        for agent in agents:
+            self.dissenter[agent] = 1
+
+    def restore_dissenters(self, names):
+        """依名稱設定異見者旗標（讀回事件檔時使用）；名稱不屬於本族群時丟出 ValueError，不默默略過"""
+        agents = []
+        for name in names:
+            agent = self.agent_id(name)
+            if agent is None:
+                raise ValueError(f"異見者 {name} 不在此族群中（模型池 {len(self.models)} 個、agent {self.size} 個）")
+            agents.append(agent)
+        self.set_dissenters(agents)
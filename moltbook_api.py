@@ -0,0 +1,219 @@
+"""
+===============================================================================
+Moltbook API 呼叫層 - 截斷規則 + 串流提前結束
+===============================================================================
+
+原本每輪都請求 max_tokens=500、等整段回應生成完，再由截斷規則丟掉 150~200 字以後的內容。
+
+串流模式（MOLTBOOK_STREAM=1）：
+- 逐 token 接收，每收到一段就對累積緩衝區跑同一套截斷規則
+- 一旦截斷結果已經「確定」（再多的 token 也不會改變結果），立刻關閉串流
+- 關閉連線後供應商停止生成，省下延遲與輸出 token 費用
+- 保證與非串流模式的截斷結果逐字相同
+
+截斷規則（truncate_content）：
+1. 150 字內找最後一個 。！？，位置 > 80 → 切在該處
+2. 200 字內找最後一個 。！？，位置 > 80 → 切在該處
+3. 180 字內找最後一個 ，，位置 > 100 → 切在該處
+4. 硬切 150 字並加 "..."
+
+因此：緩衝區超過 150 字且第 1 步成立、或緩衝區達 200 字時，結果即已確定。
+
+max_tokens：
+- request_reply 未指定 max_tokens 時，採用 moltbook_calibration 依模型校準的值
+- 每次回應的 completion_tokens 與原始字數都會回饋給校準器
+- 實驗結束時呼叫 save_calibration() 寫回 moltbook_max_tokens.json
+
+限流與重試（moltbook_ratelimit）：
+- 每次請求先向供應商 / 模型的 token bucket 取額度，取代固定的 time.sleep(1)
+- 429 / 5xx / 連線錯誤在這一層退避重試，on_retry(status, delay) 讓呼叫端記錄重試次數
+- 建立 OpenAI client 時請設 max_retries=0，避免與 SDK 內建的重試疊加
+"""
+
+import os
+from collections import namedtuple
+from dotenv import load_dotenv
+
+from moltbook_calibration import TokenCalibrator
+from moltbook_ratelimit import RateLimiter, RetryPolicy, call_with_retry, call_with_retry_async
+
+# 下列設定在 import 時讀取，需先載入 .env
+load_dotenv()
+
+DEFAULT_MAX_TOKENS = 500
+STREAMING = os.getenv("MOLTBOOK_STREAM", "0") == "1"
+CALIBRATOR = TokenCalibrator.from_env(DEFAULT_MAX_TOKENS)
+LIMITER = RateLimiter.from_env()
+RETRY_POLICY = RetryPolicy.from_env()
+
+SENTENCE_ENDS = ("。", "！", "？")
+
+# completion_tokens：串流正常結束時取自 usage；提前關閉時以收到的 chunk 數估計
+StreamResult = namedtuple("StreamResult", ["text", "chunks", "stopped_early", "completion_tokens"])
+
+
+# ========== 截斷規則 ==========
+def _last_sentence_end(content, limit):
+    return max(content[:limit].rfind(mark) for mark in SENTENCE_ENDS)
+
+
+def truncate_content(content):
+    """🔪 強制截斷：優先保證完整句子"""
+    if len(content) > 150:
+        # 第一優先：在 150 字內找完整句子標點（。！？）
+        sentence_end = _last_sentence_end(content, 150)
+        if sentence_end > 80:
+            content = content[:sentence_end + 1]
+        else:
+            # 第二優先：延伸到 200 字內找完整句子標點
+            extended_end = _last_sentence_end(content, 200)
+            if extended_end > 80:
+                content = content[:extended_end + 1]
+            else:
+                # 第三優先：找逗號作為備選
+                comma_pos = content[:180].rfind('，')
+                if comma_pos > 100:
+                    content = content[:comma_pos + 1]
+                else:
+                    # 最後手段：硬切並加省略號
+                    content = content[:150] + "..."
+    return content
+
+
+def settled_content(buffer):
+    """
+    緩衝區已足以決定最終截斷結果時回傳結果，否則回傳 None
+    （buffer.strip() 一定是完整回應 strip() 後的前綴）
+    """
+    text = buffer.strip()
+    if len(text) >= 200:
+        return truncate_content(text)
+    if len(text) > 150:
+        sentence_end = _last_sentence_end(text, 150)
+        if sentence_end > 80:
+            return text[:sentence_end + 1]
+    return None
+
+
+# ========== 串流 ==========
+def stream_completion(client, **kwargs):
+    """
+    串流接收回應，截斷結果確定後立刻關閉連線
+    回傳的 text 經 truncate_content(text.strip()) 後與完整回應的截斷結果相同
+    """
+    stream = client.chat.completions.create(
+        stream=True, stream_options={"include_usage": True}, **kwargs,
+    )
+    text = ""
+    chunks = 0
+    usage = None
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            text += delta
+            chunks += 1
+            if settled_content(text) is not None:
+                return StreamResult(text, chunks, True, chunks)
+    finally:
+        stream.close()
+    return StreamResult(text, chunks, False, usage.completion_tokens if usage else chunks)
+
+
+async def stream_completion_async(client, **kwargs):
+    """stream_completion 的 AsyncOpenAI 版本"""
+    stream = await client.chat.completions.create(
+        stream=True, stream_options={"include_usage": True}, **kwargs,
+    )
+    text = ""
+    chunks = 0
+    usage = None
+    try:
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            text += delta
+            chunks += 1
+            if settled_content(text) is not None:
+                return StreamResult(text, chunks, True, chunks)
+    finally:
+        await stream.close()
+    return StreamResult(text, chunks, False, usage.completion_tokens if usage else chunks)
+
+
+# ========== 對外介面 ==========
+def _request_kwargs(model, messages, temperature, seed, max_tokens):
+    if max_tokens is None:
+        max_tokens = CALIBRATOR.max_tokens_for(model) if CALIBRATOR else DEFAULT_MAX_TOKENS
+    kwargs = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if seed is not None:
+        kwargs["seed"] = seed
+    return kwargs
+
+
+def _calibrate(model, completion_tokens, raw_content):
+    if CALIBRATOR is None or not raw_content:
+        return
+    CALIBRATOR.record(model, completion_tokens, len(raw_content.strip()))
+
+
+def _response_text(model, response):
+    content = response.choices[0].message.content
+    usage = getattr(response, "usage", None)
+    _calibrate(model, usage.completion_tokens if usage else None, content)
+    return content
+
+
+def request_reply(client, model, messages, temperature, seed=None,
+                  max_tokens=None, stream=None, on_retry=None):
+    """
+    送出一輪請求並回傳原始回覆文字（尚未截斷）
+    stream=None 時依 MOLTBOOK_STREAM 決定是否使用串流；max_tokens=None 時使用校準值
+    可重試的錯誤會退避後重送，重試用盡才拋出例外
+    """
+    kwargs = _request_kwargs(model, messages, temperature, seed, max_tokens)
+    streaming = STREAMING if stream is None else stream
+
+    def attempt():
+        if streaming:
+            result = stream_completion(client, **kwargs)
+            _calibrate(model, result.completion_tokens, result.text)
+            return result.text
+        return _response_text(model, client.chat.completions.create(**kwargs))
+
+    return call_with_retry(attempt, model, LIMITER, RETRY_POLICY, on_retry)
+
+
+async def request_reply_async(client, model, messages, temperature, seed=None,
+                              max_tokens=None, stream=None, on_retry=None):
+    """request_reply 的 AsyncOpenAI 版本"""
+    kwargs = _request_kwargs(model, messages, temperature, seed, max_tokens)
+    streaming = STREAMING if stream is None else stream
+
+    async def attempt():
+        if streaming:
+            result = await stream_completion_async(client, **kwargs)
+            _calibrate(model, result.completion_tokens, result.text)
+            return result.text
+        return _response_text(model, await client.chat.completions.create(**kwargs))
+
+    return await call_with_retry_async(attempt, model, LIMITER, RETRY_POLICY, on_retry)
+
+
+def save_calibration():
+    """實驗結束時寫回各模型的 max_tokens 校準值"""
+    if CALIBRATOR is not None:
+        CALIBRATOR.save()
@@ -0,0 +1,469 @@
+"""
+===============================================================================
+Moltbook 歷史紀錄庫 - 把 markdown 對話紀錄 / 分析報告轉成欄位式資料（NumPy .npz）
+===============================================================================
+
+為什麼需要：
+- 歷史實驗只留下 moltbook_chaos_log_*.md / moltbook_chaos_analysis_*.md，
+  每次想問「gpt-4o 在 v3 說過幾次人類」都要重新手動翻檔案
+
+設計：
+- 串流解析：逐行讀取，不把整份 markdown 載入記憶體，支援 v1 / v2 / v3 各版紀錄格式
+    **Round N** - `模型` 🏛️          （v1 / v2：陣營 emoji）
+    **Round N** - `模型` 🎲 🦠        （v3：再加上異見者 🦠 / 正常 😇）
+  分析報告中「**Round N** - `模型`」開頭的案例段落則轉成偵測命中（hits）
+- 欄位式儲存（單一 .npz，np.load 時不需 pickle）：
+    posts：run / round / model / category / is_virus 各為一個整數陣列，
+           留言內容以 UTF-8 串接成一個 bytes blob + offsets
+    runs：實驗編號、版本、來源檔、Temperature、輪數、異見者清單
+    hits：run / round / post / category（post 為對應留言的索引，找不到為 -1）
+    模型名稱、陣營、命中類別都是字串表 + 整數索引
+- 查詢以 NumPy 布林遮罩完成，關鍵字搜尋直接掃 blob 再用 offsets 對回留言，毫秒級
+
+用法：
+    python moltbook_archive.py ingest                          # 預設讀目前目錄所有紀錄（略過 *_rescored 重算報告）
+    python moltbook_archive.py ingest logs/*.md -o archive.npz
+    python moltbook_archive.py query --version v3 --virus --contains 人類
+    python moltbook_archive.py query --model gpt-4o --hit alignment_conflict
+    python moltbook_archive.py loops --version v2 --cross-run   # 跨場次的近似重複留言（MinHash-LSH）
+"""
+
+import argparse
+import glob
+import os
+import re
+import time
+from array import array
+
+import numpy as np
+
+from moltbook_dedup import LOOP_THRESHOLD, find_duplicates
+
+ARCHIVE_PATH = "moltbook_archive.npz"
+LOG_GLOB = "moltbook_chaos_log_*.md"
+REPORT_GLOB = "moltbook_chaos_analysis_*.md"
+RESCORED_SUFFIX = "_rescored"  # moltbook_reanalyze --reports 的輸出，是既有實驗的重算版本，預設不收錄
+REPORT_VERSIONS = {"v4": "v3"}  # v3 的分析報告檔名是 moltbook_chaos_analysis_v4_*.md
+
+CATEGORIES = ("lawful", "chaotic", "uncensored", "experimental", "unknown")
+CATEGORY_EMOJI = {
+    "🏛️": "lawful",
+    "🏛": "lawful",
+    "🎲": "chaotic",
+    "💀": "uncensored",
+    "🔬": "experimental",
+    "❓": "unknown",
+}
+VIRUS_EMOJI = "🦠"
+
+# 分析報告的案例段落標題 → 偵測類別（依序比對，先命中者為準）
+HIT_HEADINGS = (
+    ("異見者成功", "virus_success"),
+    ("擴散", "virus_spread"),
+    ("被發現", "virus_detected"),
+    ("AI 至上主義", "ai_supremacy"),
+    ("對齊衝突", "alignment_conflict"),
+    ("幻覺", "hallucination"),
+    ("身分認知錯亂", "identity_confusion"),
+    ("極端", "toxic_words"),
+    ("死循環", "loops"),
+)
+HIT_CATEGORIES = tuple(category for _, category in HIT_HEADINGS)
+
+ROUND_HEADER = re.compile(r"^\*\*Round (\d+)\*\* - `([^`]+)`(.*)$")
+META_LINE = re.compile(r"^- \*\*(.+?)\*\*: (.*)$")
+LIST_MODEL = re.compile(r"^- `([^`]+)`\s*$")
+FILE_NAME = re.compile(r"_v(\d+)_(.+)\.md$")
+
+
+# ========== 解析 ==========
+def _finish_post(post, lines):
+    while lines and lines[-1].strip() in ("", "---"):
+        lines.pop()
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    post["content"] = "\n".join(lines)
+    return post
+
+
+def iter_log(lines):
+    """
+    串流解析一份對話紀錄，依序產生 ("meta", dict) 一次與 ("post", dict) 多次
+    meta 含「- **欄位**: 值」的實驗資訊與異見者清單（virus_models）
+    """
+    meta = {"virus_models": []}
+    section = None
+    post, content = None, []
+    for raw in lines:
+        line = raw.rstrip("\n")
+        if line.startswith("## "):
+            if "完整對話串" in line:
+                section = "thread"
+                yield "meta", meta
+            elif section != "thread":
+                section = "dissenters" if "異見者模型清單" in line else "header"
+            continue
+
+        if section != "thread":
+            match = META_LINE.match(line)
+            if match:
+                meta[match.group(1)] = match.group(2).strip().strip("`")
+            elif section == "dissenters":
+                match = LIST_MODEL.match(line)
+                if match:
+                    meta["virus_models"].append(match.group(1))
+            continue
+
+        match = ROUND_HEADER.match(line)
+        if match:
+            if post:
+                yield "post", _finish_post(post, content)
+            markers = match.group(3).split()
+            category = "unknown"
+            for marker in markers:
+                if marker in CATEGORY_EMOJI:
+                    category = CATEGORY_EMOJI[marker]
+                    break
+            post = {
+                "round": int(match.group(1)),
+                "model": match.group(2),
+                "category": category,
+                "is_virus": VIRUS_EMOJI in markers,
+            }
+            content = []
+        elif post:
+            content.append(line)
+    if post:
+        yield "post", _finish_post(post, content)
+
+
+def iter_report_hits(lines):
+    """串流解析分析報告，產生 (偵測類別, 輪次, 模型)；無法辨識的段落略過"""
+    category = None
+    for raw in lines:
+        line = raw.rstrip("\n")
+        if line.startswith("## "):
+            category = None
+            for keyword, name in HIT_HEADINGS:
+                if keyword in line:
+                    category = name
+                    break
+            continue
+        if category:
+            match = ROUND_HEADER.match(line)
+            if match:
+                yield category, int(match.group(1)), match.group(2)
+
+
+def describe_file(path):
+    """由檔名取得 (版本, 實驗編號)，例如 moltbook_chaos_log_v3_20260203_122243.md → ("v3", "20260203_122243")"""
+    match = FILE_NAME.search(os.path.basename(path))
+    if not match:
+        return None, os.path.splitext(os.path.basename(path))[0]
+    return f"v{match.group(1)}", match.group(2)
+
+
+# ========== 建立 ==========
+class ArchiveBuilder:
+    """逐檔累積欄位（array / bytearray），最後一次轉成 NumPy 陣列寫出"""
+
+    def __init__(self):
+        self.models = {}
+        self.run_index = {}
+        self.runs = {key: [] for key in ("experiment_id", "version", "source", "temperature", "rounds")}
+        self.run_virus_offsets = array("q", [0])
+        self.run_virus_names = []
+        self.post_run = array("i")
+        self.post_round = array("i")
+        self.post_model = array("i")
+        self.post_category = array("b")
+        self.post_virus = array("b")
+        self.content_offsets = array("q", [0])
+        self.content_blob = bytearray()
+        self.hit_run = array("i")
+        self.hit_round = array("i")
+        self.hit_category = array("b")
+
+    def _model_id(self, name):
+        if name not in self.models:
+            self.models[name] = len(self.models)
+        return self.models[name]
+
+    def add_log(self, path):
+        """加入一份對話紀錄，回傳留言數"""
+        version, experiment_id = describe_file(path)
+        count = 0
+        with open(path, encoding="utf-8") as f:
+            for kind, item in iter_log(f):
+                if kind == "meta":
+                    run = self._add_run(item, version, experiment_id, path)
+                    continue
+                self.post_run.append(run)
+                self.post_round.append(item["round"])
+                self.post_model.append(self._model_id(item["model"]))
+                self.post_category.append(CATEGORIES.index(item["category"]))
+                self.post_virus.append(item["is_virus"])
+                self.content_blob += item["content"].encode("utf-8")
+                self.content_offsets.append(len(self.content_blob))
+                count += 1
+        return count
+
+    def _add_run(self, meta, version, experiment_id, path):
+        experiment_id = meta.get("實驗編號", experiment_id)
+        run = len(self.runs["experiment_id"])
+        # 不同版本的實驗編號可能相同（例如同一秒啟動的 v2 / v3），以 (版本, 實驗編號) 為鍵
+        self.run_index[(version or "", experiment_id)] = run
+        self.runs["experiment_id"].append(experiment_id)
+        self.runs["version"].append(version or "")
+        self.runs["source"].append(os.path.basename(path))
+        temperature = re.match(r"[\d.]+", meta.get("Temperature", ""))
+        self.runs["temperature"].append(float(temperature.group()) if temperature else np.nan)
+        rounds = re.match(r"\d+", meta.get("接龍輪數", ""))
+        self.runs["rounds"].append(int(rounds.group()) if rounds else -1)
+        self.run_virus_names.extend(meta["virus_models"])
+        self.run_virus_offsets.append(len(self.run_virus_names))
+        return run
+
+    def add_report(self, path):
+        """加入一份分析報告的偵測命中；對應的對話紀錄需先加入，否則略過並回傳 0"""
+        version, experiment_id = describe_file(path)
+        run = self.run_index.get((REPORT_VERSIONS.get(version, version or ""), experiment_id))
+        if run is None:
+            return 0
+        count = 0
+        with open(path, encoding="utf-8") as f:
+            for category, round_num, _ in iter_report_hits(f):
+                self.hit_run.append(run)
+                self.hit_round.append(round_num)
+                self.hit_category.append(HIT_CATEGORIES.index(category))
+                count += 1
+        return count
+
+    def arrays(self):
+        post_run = np.frombuffer(self.post_run, dtype=np.int32).copy()
+        post_round = np.frombuffer(self.post_round, dtype=np.int32).copy()
+        hit_run = np.frombuffer(self.hit_run, dtype=np.int32).copy()
+        hit_round = np.frombuffer(self.hit_round, dtype=np.int32).copy()
+
+        # 命中對回留言：(run, round) 合成一個鍵後二分搜尋
+        post_key = post_run.astype(np.int64) << 32 | post_round
+        order = np.argsort(post_key, kind="stable")
+        hit_key = hit_run.astype(np.int64) << 32 | hit_round
+        pos = np.searchsorted(post_key[order], hit_key)
+        pos = np.minimum(pos, max(len(order) - 1, 0))
+        hit_post = np.full(len(hit_key), -1, dtype=np.int32)
+        if len(order):
+            found = post_key[order][pos] == hit_key
+            hit_post[found] = order[pos[found]]
+
+        return {
+            "models": np.array(list(self.models), dtype=str),
+            "categories": np.array(CATEGORIES, dtype=str),
+            "hit_categories": np.array(HIT_CATEGORIES, dtype=str),
+            "run_experiment_id": np.array(self.runs["experiment_id"], dtype=str),
+            "run_version": np.array(self.runs["version"], dtype=str),
+            "run_source": np.array(self.runs["source"], dtype=str),
+            "run_temperature": np.array(self.runs["temperature"], dtype=np.float32),
+            "run_rounds": np.array(self.runs["rounds"], dtype=np.int32),
+            "run_virus_offsets": np.frombuffer(self.run_virus_offsets, dtype=np.int64).copy(),
+            "run_virus_names": np.array(self.run_virus_names, dtype=str),
+            "post_run": post_run,
+            "post_round": post_round,
+            "post_model": np.frombuffer(self.post_model, dtype=np.int32).copy(),
+            "post_category": np.frombuffer(self.post_category, dtype=np.int8).copy(),
+            "post_virus": np.frombuffer(self.post_virus, dtype=np.int8).astype(bool),
+            "content_offsets": np.frombuffer(self.content_offsets, dtype=np.int64).copy(),
+            "content_blob": np.frombuffer(bytes(self.content_blob), dtype=np.uint8),
+            "hit_run": hit_run,
+            "hit_round": hit_round,
+            "hit_post": hit_post,
+            "hit_category": np.frombuffer(self.hit_category, dtype=np.int8).copy(),
+        }
+
+    def save(self, path=ARCHIVE_PATH):
+        """原子寫入 .npz（np.savez 會自動補副檔名，暫存檔需以 .npz 結尾）"""
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        np.savez(tmp_path, **self.arrays())
+        os.replace(tmp_path, path)
+        return path
+
+
+def build_archive(log_paths, report_paths=(), path=ARCHIVE_PATH):
+    """解析所有紀錄並寫出，回傳 (留言數, 命中數)"""
+    builder = ArchiveBuilder()
+    posts = sum(builder.add_log(p) for p in log_paths)
+    hits = sum(builder.add_report(p) for p in report_paths)
+    builder.save(path)
+    return posts, hits
+
+
+# ========== 查詢 ==========
+class Archive:
+    """
+    載入後的欄位式資料；所有欄位都是 NumPy 陣列（屬性名稱同 .npz 內的 key）
+    """
+
+    def __init__(self, arrays):
+        self.__dict__.update(arrays)
+        self._blob = self.content_blob.tobytes()
+
+    @classmethod
+    def load(cls, path=ARCHIVE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def __len__(self):
+        return len(self.post_run)
+
+    def content(self, index):
+        start, end = self.content_offsets[index], self.content_offsets[index + 1]
+        return self._blob[start:end].decode("utf-8")
+
+    def virus_models(self, run):
+        start, end = self.run_virus_offsets[run], self.run_virus_offsets[run + 1]
+        return list(self.run_virus_names[start:end])
+
+    def mask(self, version=None, model=None, category=None, is_virus=None, hit=None):
+        """回傳符合所有條件的留言布林遮罩；model 可只給簡稱的一部分"""
+        selected = np.ones(len(self), dtype=bool)
+        if version:
+            selected &= (self.run_version == version)[self.post_run]
+        if model:
+            model_ids = [i for i, name in enumerate(self.models) if model in name]
+            selected &= np.isin(self.post_model, model_ids)
+        if category:
+            selected &= self.post_category == list(self.categories).index(category)
+        if is_virus is not None:
+            selected &= self.post_virus == is_virus
+        if hit:
+            hit_posts = self.hit_post[(self.hit_category == list(self.hit_categories).index(hit)) & (self.hit_post >= 0)]
+            in_hits = np.zeros(len(self), dtype=bool)
+            in_hits[hit_posts] = True
+            selected &= in_hits
+        return selected
+
+    def contains(self, keyword, mask=None):
+        """內容包含 keyword 的留言遮罩：直接在 UTF-8 blob 上搜尋，再用 offsets 對回留言"""
+        needle = keyword.encode("utf-8")
+        positions = []
+        start = self._blob.find(needle)
+        while start != -1:
+            positions.append(start)
+            start = self._blob.find(needle, start + 1)
+        found = np.zeros(len(self), dtype=bool)
+        if positions:
+            posts = np.searchsorted(self.content_offsets, positions, side="right") - 1
+            ends = self.content_offsets[posts + 1]
+            found[posts[np.asarray(positions) + len(needle) <= ends]] = True
+        return found if mask is None else found & mask
+
+    def near_duplicates(self, mask=None, threshold=LOOP_THRESHOLD):
+        """
+        依紀錄庫順序，每則留言與更早留言中最相似者的 (留言, 較早留言, 相似度)，
+        以單一 MinHash-LSH 索引涵蓋所有被選取的場次（不做兩兩比對）
+        """
+        indices = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        return find_duplicates((self.content(i) for i in indices), [int(i) for i in indices], threshold)
+
+    def model_counts(self, mask=None):
+        """{模型: 留言數}，依留言數排序"""
+        ids = self.post_model if mask is None else self.post_model[mask]
+        counts = np.bincount(ids, minlength=len(self.models))
+        order = np.argsort(-counts, kind="stable")
+        return {str(self.models[i]): int(counts[i]) for i in order if counts[i]}
+
+
+# ========== 主程式 ==========
+def _expand(patterns, default):
+    paths = []
+    for pattern in patterns or [default]:
+        paths.extend(sorted(glob.glob(pattern)) if any(c in pattern for c in "*?[") else [pattern])
+    return paths
+
+
+def _default_paths(pattern):
+    return [p for p in _expand(None, pattern)
+            if not os.path.splitext(os.path.basename(p))[0].endswith(RESCORED_SUFFIX)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moltbook 歷史紀錄庫（markdown → NumPy 欄位式資料）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="解析對話紀錄與分析報告")
+    ingest.add_argument("paths", nargs="*", help=f"紀錄檔或 glob（預設 {LOG_GLOB} 與 {REPORT_GLOB}，不含 *{RESCORED_SUFFIX}）")
+    ingest.add_argument("-o", "--output", default=ARCHIVE_PATH)
+
+    query = sub.add_parser("query", help="查詢已建立的紀錄庫")
+    query.add_argument("-i", "--input", default=ARCHIVE_PATH)
+    query.add_argument("--version", help="v1 / v2 / v3")
+    query.add_argument("--model", help="模型名稱（可只給一部分）")
+    query.add_argument("--category", choices=CATEGORIES)
+    query.add_argument("--virus", dest="is_virus", action="store_true", default=None, help="只看異見者留言")
+    query.add_argument("--no-virus", dest="is_virus", action="store_false", help="只看正常模型留言")
+    query.add_argument("--hit", choices=HIT_CATEGORIES, help="分析報告中標記為某類現象的留言")
+    query.add_argument("--contains", help="內容包含的關鍵字")
+    query.add_argument("--limit", type=int, default=5, help="列出的留言數")
+
+    loops = sub.add_parser("loops", help="近似重複（鸚鵡學舌）留言，可跨場次")
+    loops.add_argument("-i", "--input", default=ARCHIVE_PATH)
+    loops.add_argument("--version", help="v1 / v2 / v3")
+    loops.add_argument("--model", help="模型名稱（可只給一部分）")
+    loops.add_argument("--threshold", type=float, default=LOOP_THRESHOLD, help="MinHash 估計的相似度門檻")
+    loops.add_argument("--cross-run", action="store_true", help="只列出與其他場次留言重複者")
+    loops.add_argument("--limit", type=int, default=5, help="列出的組數")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        if args.paths:
+            paths = _expand(args.paths, LOG_GLOB)
+            logs = [p for p in paths if "_analysis_" not in os.path.basename(p)]
+            reports = [p for p in paths if "_analysis_" in os.path.basename(p)]
+        else:
+            logs, reports = _default_paths(LOG_GLOB), _default_paths(REPORT_GLOB)
+        started = time.perf_counter()
+        posts, hits = build_archive(logs, reports, args.output)
+        elapsed = time.perf_counter() - started
+        print(f"🗂️ {args.output}: {len(logs)} 份紀錄 / {posts} 則留言 / {len(reports)} 份報告 / {hits} 筆命中"
+              f"（{elapsed * 1000:.0f} ms，{os.path.getsize(args.output) / 1024:.0f} KB）")
+        return
+
+    started = time.perf_counter()
+    archive = Archive.load(args.input)
+    loaded = time.perf_counter()
+    if args.command == "loops":
+        selected = archive.mask(args.version, args.model)
+        pairs = archive.near_duplicates(selected, args.threshold)
+        if args.cross_run:
+            pairs = [pair for pair in pairs if archive.post_run[pair[0]] != archive.post_run[pair[1]]]
+        elapsed = time.perf_counter() - loaded
+        print(f"🔁 {len(pairs)} / {int(selected.sum())} 則留言與先前留言相似度 ≥ {args.threshold}"
+              f"（載入 {(loaded - started) * 1000:.1f} ms，索引 {elapsed * 1000:.0f} ms）")
+        for i, j, score in sorted(pairs, key=lambda pair: -pair[2])[:args.limit]:
+            print(f"\n相似度 {score:.2f}")
+            for k in (j, i):
+                run = archive.post_run[k]
+                print(f"**{archive.run_version[run]} {archive.run_experiment_id[run]} Round {archive.post_round[k]}** - "
+                      f"`{archive.models[archive.post_model[k]]}`")
+                print(archive.content(k))
+        return
+
+    selected = archive.mask(args.version, args.model, args.category, args.is_virus, args.hit)
+    if args.contains:
+        selected = archive.contains(args.contains, selected)
+    indices = np.flatnonzero(selected)
+    elapsed = time.perf_counter() - loaded
+
+    print(f"🔎 {len(indices)} / {len(archive)} 則留言符合（載入 {(loaded - started) * 1000:.1f} ms，查詢 {elapsed * 1000:.2f} ms）")
+    for model, count in list(archive.model_counts(selected).items())[:10]:
+        print(f"   {model}: {count}")
+    for i in indices[:args.limit]:
+        run = archive.post_run[i]
+        role = " 🦠" if archive.post_virus[i] else ""
+        print(f"\n**{archive.run_version[run]} {archive.run_experiment_id[run]} Round {archive.post_round[i]}** - "
+              f"`{archive.models[archive.post_model[i]]}`{role}")
+        print(archive.content(i))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+===============================================================================
+Moltbook 非同步引擎 - 單一 event loop 同時推進多場實驗（可混合 v1 / v2 / v3）
+===============================================================================
+
+設計：
+- 使用 AsyncOpenAI，等待 API 回應時不再佔住整個程序
+- 每場實驗的接龍仍嚴格依序：上一輪留言寫入 history 後，才組下一輪的上下文
+- 多場實驗之間互相獨立，共用同一個 client 與 event loop（連線池大小 = --concurrency）
+- 以 asyncio.Semaphore 限制「同時在途」的 API 請求數（--concurrency）
+- 發送速率由 moltbook_ratelimit 的 token bucket 控制，429 / 5xx 自動退避重試
+- 接龍迴圈由 moltbook_core 提供，--version 可指定多個範式輪流分配給各場實驗
+- --resume BATCH_ID 以相同的 --runs / --version 接續中斷的批次：有事件紀錄的場次從最後一個
+  checkpoint 接續，已完成的場次直接輸出報告，沒開始的場次重新建立
+- --fork 事件檔 --at K：從該場第 K 輪結束時分岔出 --runs 個分支同時推進，
+  前 K 輪只讀一次、所有分支共用（見 moltbook_core.fork_runs）
+
+用法：
+    python moltbook_async_engine.py --runs 24 --concurrency 8
+    python moltbook_async_engine.py --runs 4 --rounds 10 --seed 42
+    python moltbook_async_engine.py --runs 12 --version v1 v2 v3
+    python moltbook_async_engine.py --runs 12 --version v1 v2 v3 --resume 20260203_122243
+    python moltbook_async_engine.py --fork moltbook_events_v3_20260203_122243.jsonl --at 20 --runs 16
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+
+from moltbook_api import save_calibration
+from moltbook_cache import print_cache_stats
+from moltbook_core import VERSIONS, fork_runs, get_strategy, new_run, resume_run, run_rounds_async
+from moltbook_profile import print_dropped
+from moltbook_transport import add_mock_argument, apply_mock_argument, get_async_client, print_connection_stats
+
+load_dotenv()
+
+DEFAULT_CONCURRENCY = 8
+
+
+def make_async_client(concurrency=DEFAULT_CONCURRENCY):
+    """共用的 AsyncOpenAI client，連線池大小與併發上限一致"""
+    return get_async_client(max_connections=concurrency)
+
+
+async def run_experiment_async(client, semaphore, seed=None, experiment_id=None,
+                               rounds=None, verbose=False, version="v3", resume=False, agents=None):
+    """
+    非同步執行一場實驗（單場內輪次嚴格依序）
+    semaphore 由所有實驗共用，用來限制整體併發數
+    resume=True 時若已有該場的事件紀錄，從最後一個 checkpoint 接續
+    agents：agent 數（預設每個模型一個，見 moltbook_agents）
+    """
+    run = None
+    if resume:
+        try:
+            run = resume_run(version, experiment_id)
+        except FileNotFoundError:
+            pass
+    if run is None:
+        run = new_run(get_strategy(version), seed, experiment_id, rounds, agents=agents)
+    if run["finished"]:
+        return run
+    return await run_rounds_async(run, client, semaphore, verbose)
+
+
+async def run_many(num_runs, concurrency=DEFAULT_CONCURRENCY, rounds=None,
+                   base_seed=None, batch_id=None, client=None, on_done=None,
+                   versions=("v3",), resume=False, agents=None):
+    """
+    同時推進 num_runs 場實驗，回傳依 run 編號排序的結果清單
+    第 k 場使用 versions[k % len(versions)]；base_seed 給定時 seed = base_seed + k
+    resume=True 時以 batch_id 找回各場事件紀錄接續執行
+    """
+    client = client or make_async_client(concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    batch_id = batch_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    async def one(k):
+        seed = None if base_seed is None else base_seed + k
+        version = versions[k % len(versions)]
+        run = await run_experiment_async(
+            client, semaphore, seed=seed,
+            experiment_id=f"{batch_id}_r{k:03d}", rounds=rounds, version=version,
+            resume=resume, agents=agents,
+        )
+        if on_done:
+            on_done(run)
+        return run
+
+    return await asyncio.gather(*(one(k) for k in range(num_runs)))
+
+
+async def fork_many(path, round_num, branches, concurrency=DEFAULT_CONCURRENCY, rounds=None,
+                    base_seed=None, client=None, on_done=None):
+    """
+    從事件檔第 round_num 輪分岔出 branches 個分支並同時推進，回傳依分支編號排序的結果清單
+    base_seed 給定時第 b 個分支 seed = base_seed + b
+    """
+    client = client or make_async_client(concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    runs = fork_runs(path, round_num, branches, seed=base_seed, rounds=rounds)
+
+    async def one(run):
+        await run_rounds_async(run, client, semaphore)
+        if on_done:
+            on_done(run)
+        return run
+
+    return await asyncio.gather(*(one(run) for run in runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moltbook 非同步批次引擎")
+    parser.add_argument("--runs", type=int, default=1, help="同時推進的實驗場數（--fork 時為分支數）")
+    parser.add_argument("--version", nargs="+", default=["v3"], choices=sorted(VERSIONS), help="實驗範式（多個時輪流分配）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時在途的 API 請求上限")
+    parser.add_argument("--rounds", type=int, default=None, help="每場接龍輪數（預設沿用各範式 ROUNDS）")
+    parser.add_argument("--seed", type=int, default=None, help="基準亂數種子（第 k 場使用 seed + k）")
+    parser.add_argument("--agents", type=int, default=None, help="每場的 agent 數（預設每個模型一個）")
+    parser.add_argument("--no-reports", action="store_true", help="不輸出每場的 markdown 紀錄")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="接續中斷的批次（--runs / --version 需與原本相同）")
+    parser.add_argument("--fork", metavar="EVENT_LOG", help="從既有事件檔分岔出 --runs 個分支")
+    parser.add_argument("--at", type=int, default=None, help="分岔點：第幾輪結束後（搭配 --fork）")
+    add_mock_argument(parser)
+    args = parser.parse_args()
+    if args.fork and args.at is None:
+        parser.error("--fork 需要搭配 --at 指定分岔輪次")
+    apply_mock_argument(args)
+
+    print("=" * 70)
+    print("⚡ Moltbook 非同步引擎")
+    print("=" * 70)
+    print(f"🧪 實驗場數: {args.runs}")
+    print(f"🔬 範式: {', '.join(args.version)}")
+    print(f"🚦 併發上限: {args.concurrency}")
+    print(f"🔄 每場輪數: {args.rounds or '預設'}")
+    if args.resume:
+        print(f"♻️ 接續批次: {args.resume}")
+    if args.fork:
+        print(f"🌿 分岔: {args.fork} 第 {args.at} 輪後 × {args.runs} 個分支")
+    print("=" * 70)
+    for version in args.version:
+        print_dropped(get_strategy(version).dropped_models)
+
+    def on_done(run):
+        rounds_ok = len(run["history"]) - 1
+        extra = run["strategy"].summary_text(run)
+        print(f"✅ {run['experiment_id']} ({run['version']}): {rounds_ok}/{run['rounds']} 輪"
+              f"{', ' + extra if extra else ''}")
+        if not args.no_reports:
+            run["strategy"].write_reports(run)
+
+    client = make_async_client(args.concurrency)
+    started = time.perf_counter()
+    if args.fork:
+        batch = fork_many(
+            args.fork, args.at, args.runs, args.concurrency, args.rounds,
+            base_seed=args.seed, client=client, on_done=on_done,
+        )
+    else:
+        batch = run_many(
+            args.runs, args.concurrency, args.rounds, base_seed=args.seed,
+            batch_id=args.resume, client=client, on_done=on_done, versions=args.version,
+            resume=bool(args.resume), agents=args.agents,
+        )
+    runs = asyncio.run(batch)
+    elapsed = time.perf_counter() - started
+
+    total_rounds = sum(len(run["history"]) - 1 for run in runs)
+    total_failures = sum(len(run["statistics"]["model_failures"]) for run in runs)
+    total_retries = sum(len(run["statistics"]["api_retries"]) for run in runs)
+
+    print("\n" + "=" * 70)
+    print("📊 批次統計:")
+    print(f"   🔄 完成輪數: {total_rounds}")
+    print(f"   ❌ API 失敗: {total_failures} 次")
+    print(f"   ⏳ API 重試: {total_retries} 次")
+    print(f"   ⏱️ 總耗時: {elapsed:.1f} 秒")
+    print(f"   🚀 吞吐量: {total_rounds / elapsed if elapsed else 0:.2f} 輪/秒")
+    print_cache_stats(client)
+    print_connection_stats()
+    save_calibration()
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
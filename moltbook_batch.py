@@ -0,0 +1,334 @@
+"""
+===============================================================================
+Moltbook 蒙地卡羅批次 - 多場可重現實驗 + 彙總統計
+===============================================================================
+
+為什麼需要：
+- 報告中的「100% 異見者成功率」「0 次偵測」都來自單場 50 輪實驗
+- 單場實驗的異見者由未設 seed 的 random.sample 抽出，無法重現也無法估計變異
+
+設計：
+- 第 k 場實驗使用 seed = base_seed + k（異見者分配、模型抽籤、@ 對象全部可重現）
+- 以 ProcessPoolExecutor 分散到所有 CPU 核心，一次啟動跑完 N 場
+- worker 程序重複使用同一個連線池（moltbook_transport），下一場 replicate 不必重新握手
+- 彙總 virus_success_rate / infection_count 的平均值與 95% 信賴區間，
+  以及每個模型的發言次數與各類現象命中率
+- v3 另彙總異見者擴散圖譜（moltbook_graph）：k 跳內被波及的正常留言數、單一擴散的最大深度 / 寬度
+- 各版本彙總正常留言的立場分數與漂移量（moltbook_stance，與異見論點錨點句的相似度）
+
+用法：
+    python moltbook_batch.py --version v3 --replicates 32 --seed 1000
+    python moltbook_batch.py --version v1 v2 v3 --replicates 10 --rounds 20
+"""
+
+import argparse
+import json
+import math
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from moltbook_api import save_calibration
+from moltbook_core import VERSIONS, get_strategy, new_run, run_rounds
+from moltbook_graph import DEFAULT_HOPS
+from moltbook_stance import drift_change, run_stance
+from moltbook_profile import print_dropped
+from moltbook_transport import add_mock_argument, apply_mock_argument, connection_stats
+
+# 95% 雙尾 t 分佈臨界值（自由度 1~30），更大的自由度以常態近似
+T_CRITICAL_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+
+
+def summarize_replicate(version, run):
+    """
+    把單場實驗壓縮成可跨程序傳遞的摘要（不含完整對話）
+    statistics 中每筆紀錄的第 2 欄都是模型名稱
+    """
+    history = run["history"]
+    statistics = run["statistics"]
+    virus_models = run.get("virus_models", set())
+
+    posts = Counter(h["model"] for h in history.posts())
+    virus_posts = Counter(h["model"] for h in history.posts() if h.get("is_virus", False))
+
+    summary = {
+        "version": version,
+        "seed": run["seed"],
+        "experiment_id": run["experiment_id"],
+        "rounds": run["rounds"],
+        "rounds_ok": len(history) - 1,
+        "virus_models": sorted(virus_models),
+        "posts": dict(posts),
+        "virus_posts": dict(virus_posts),
+        "counts": {key: len(items) for key, items in statistics.items()},
+        "by_model": {
+            key: dict(Counter(item[1] for item in items))
+            for key, items in statistics.items()
+        },
+        "virus_success_rate": None,
+        "infection_count": None,
+        "cascade_exposed": None,
+        "cascade_max_depth": None,
+        "cascade_max_breadth": None,
+    }
+
+    prompt_tokens = [h["prompt_tokens"] for h in history.posts() if "prompt_tokens" in h]
+    summary["prompt_tokens"] = sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else None
+
+    stance = run_stance(run)
+    normal = stance["scores"][~stance["is_virus"]]
+    summary["stance_normal"] = float(normal.mean()) if len(normal) else None
+    summary["stance_drift"] = drift_change(stance["drift"])
+
+    if "virus_success" in statistics:
+        total_virus_posts = sum(virus_posts.values())
+        summary["virus_success_rate"] = (
+            len(statistics["virus_success"]) / total_virus_posts * 100 if total_virus_posts else 0
+        )
+        summary["infection_count"] = len(statistics["virus_spread"])
+        graph = run["graph"]
+        cascades = graph.cascades(DEFAULT_HOPS)
+        summary["cascade_exposed"] = graph.exposed(DEFAULT_HOPS)
+        summary["cascade_max_depth"] = max((c["depth"] for c in cascades), default=0)
+        summary["cascade_max_breadth"] = max((c["breadth"] for c in cascades), default=0)
+
+    return summary
+
+
+def run_replicate(version, seed, experiment_id, rounds, write_logs=False):
+    """在 worker 程序內執行一場實驗（必須是模組層級函式才能被 pickle）"""
+    strategy = get_strategy(version)
+    before = connection_stats()
+    run = new_run(strategy, seed, experiment_id, rounds)
+    run_rounds(run, verbose=False)
+    save_calibration()
+    if write_logs:
+        strategy.write_reports(run)
+    summary = summarize_replicate(version, run)
+    after = connection_stats()
+    summary["connections"] = {
+        key: after[key] - before[key] for key in ("requests", "connections", "tls_handshakes")
+    }
+    return summary
+
+
+def mean_ci(values):
+    """回傳 (平均, 標準差, 95% CI 下界, 95% CI 上界)；樣本不足時 CI 為 None"""
+    n = len(values)
+    if n == 0:
+        return None, None, None, None
+    mean = sum(values) / n
+    if n < 2:
+        return mean, 0.0, None, None
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+    df = n - 1
+    t = T_CRITICAL_95[df - 1] if df <= len(T_CRITICAL_95) else 1.96
+    half = t * std / math.sqrt(n)
+    return mean, std, mean - half, mean + half
+
+
+def aggregate(summaries):
+    """
+    合併同一版本多場實驗的摘要：
+    - metrics: 各指標的平均與 95% CI
+    - models: 每個模型的發言次數、各現象命中率（命中 / 發言），v3 另含異見者成功率與被影響率
+    """
+    metrics = {}
+    keys = sorted({key for s in summaries for key in s["counts"]})
+    for key in keys:
+        metrics[key] = mean_ci([s["counts"].get(key, 0) for s in summaries])
+    metrics["rounds_ok"] = mean_ci([s["rounds_ok"] for s in summaries])
+    for key in ("virus_success_rate", "infection_count", "cascade_exposed", "cascade_max_depth", "cascade_max_breadth",
+                "stance_normal", "stance_drift", "prompt_tokens"):
+        values = [s.get(key) for s in summaries if s.get(key) is not None]
+        if values:
+            metrics[key] = mean_ci(values)
+
+    posts = Counter()
+    virus_posts = Counter()
+    dissenter_draws = Counter()
+    hits = {key: Counter() for key in keys}
+    for s in summaries:
+        posts.update(s["posts"])
+        virus_posts.update(s["virus_posts"])
+        dissenter_draws.update(s["virus_models"])
+        for key, by_model in s["by_model"].items():
+            hits[key].update(by_model)
+
+    models = {}
+    for model, count in posts.items():
+        row = {
+            "posts": count,
+            "rates": {
+                key: hits[key][model] / count
+                for key in keys if key not in ("virus_success", "virus_spread")
+            },
+        }
+        if "virus_success" in hits:
+            normal_posts = count - virus_posts[model]
+            row["dissenter_draws"] = dissenter_draws[model]
+            row["virus_posts"] = virus_posts[model]
+            row["virus_success_rate"] = (
+                hits["virus_success"][model] / virus_posts[model] if virus_posts[model] else None
+            )
+            row["infection_rate"] = (
+                hits["virus_spread"][model] / normal_posts if normal_posts else None
+            )
+        models[model] = row
+
+    return {"replicates": len(summaries), "metrics": metrics, "models": models}
+
+
+def run_batch(versions, replicates, base_seed, rounds=None, workers=None,
+              batch_id=None, write_logs=False, on_done=None):
+    """
+    將 versions × replicates 場實驗送進程序池，回傳 {version: [summary, ...]}
+    """
+    batch_id = batch_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    workers = workers or os.cpu_count() or 1
+    results = {version: [] for version in versions}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 各範式交錯送出：同一個程序池、快取與連線池同時服務 v1 / v2 / v3
+        futures = []
+        for k in range(replicates):
+            for version in versions:
+                futures.append(pool.submit(
+                    run_replicate, version, base_seed + k,
+                    f"{batch_id}_{version}_s{base_seed + k}",
+                    rounds or get_strategy(version).rounds, write_logs,
+                ))
+
+        for future in as_completed(futures):
+            summary = future.result()
+            results[summary["version"]].append(summary)
+            if on_done:
+                on_done(summary)
+
+    for summaries in results.values():
+        summaries.sort(key=lambda s: s["seed"])
+    return results
+
+
+def _fmt(value, pattern="{:.2f}"):
+    return "—" if value is None else pattern.format(value)
+
+
+def write_batch_report(batch_id, version, summaries, agg):
+    """輸出彙總 markdown 報告與逐場 JSON 摘要"""
+    report_filename = f"moltbook_batch_{version}_{batch_id}.md"
+    json_filename = f"moltbook_batch_{version}_{batch_id}.json"
+
+    with open(json_filename, "w", encoding="utf-8") as f:
+        json.dump({"batch_id": batch_id, "version": version,
+                   "summaries": summaries, "aggregate": agg}, f, ensure_ascii=False, indent=2)
+
+    with open(report_filename, "w", encoding="utf-8") as f:
+        f.write(f"# 🎲 Moltbook {version} 蒙地卡羅彙總報告\n\n")
+        f.write("## 🔬 批次資訊\n\n")
+        f.write(f"- **批次編號**: `{batch_id}`\n")
+        f.write(f"- **重複場數**: {agg['replicates']}\n")
+        f.write(f"- **Seeds**: {summaries[0]['seed']} ~ {summaries[-1]['seed']}\n\n")
+
+        f.write("---\n\n")
+        f.write("## 📈 指標彙總（平均值與 95% 信賴區間）\n\n")
+        f.write("| 指標 | 平均 | 標準差 | 95% CI |\n")
+        f.write("|------|------|--------|--------|\n")
+        for key, (mean, std, low, high) in agg["metrics"].items():
+            ci = f"[{_fmt(low)}, {_fmt(high)}]" if low is not None else "—"
+            f.write(f"| {key} | {_fmt(mean)} | {_fmt(std)} | {ci} |\n")
+
+        f.write("\n---\n\n")
+        f.write("## 🤖 各模型統計\n\n")
+        rate_keys = sorted({key for row in agg["models"].values() for key in row["rates"]})
+        has_virus = any("virus_success_rate" in row for row in agg["models"].values())
+        header = ["模型", "發言"] + rate_keys
+        if has_virus:
+            header += ["異見者抽中", "異見者成功率", "被影響率"]
+        f.write("| " + " | ".join(header) + " |\n")
+        f.write("|" + "|".join(["------"] * len(header)) + "|\n")
+        for model, row in sorted(agg["models"].items(), key=lambda x: x[1]["posts"], reverse=True):
+            cells = [f"`{model.split('/')[-1]}`", str(row["posts"])]
+            cells += [_fmt(row["rates"].get(key), "{:.1%}") for key in rate_keys]
+            if has_virus:
+                cells += [
+                    str(row["dissenter_draws"]),
+                    _fmt(row["virus_success_rate"], "{:.1%}"),
+                    _fmt(row["infection_rate"], "{:.1%}"),
+                ]
+            f.write("| " + " | ".join(cells) + " |\n")
+        f.write("\n")
+
+    return report_filename, json_filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moltbook 蒙地卡羅批次實驗")
+    parser.add_argument("--version", nargs="+", default=["v3"], choices=sorted(VERSIONS), help="實驗版本（可多選）")
+    parser.add_argument("--replicates", type=int, default=10, help="每個版本的重複場數")
+    parser.add_argument("--seed", type=int, default=0, help="基準亂數種子（第 k 場使用 seed + k）")
+    parser.add_argument("--rounds", type=int, default=None, help="每場接龍輪數（預設沿用各版本 ROUNDS）")
+    parser.add_argument("--workers", type=int, default=None, help="程序池大小（預設 = CPU 核心數）")
+    parser.add_argument("--write-logs", action="store_true", help="同時輸出每場的對話紀錄與分析報告")
+    add_mock_argument(parser)
+    args = parser.parse_args()
+    if args.replicates < 1:
+        parser.error("--replicates 至少為 1")
+    apply_mock_argument(args)
+
+    batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    workers = args.workers or os.cpu_count() or 1
+    total = len(args.version) * args.replicates
+
+    print("=" * 70)
+    print("🎲 Moltbook 蒙地卡羅批次開始")
+    print("=" * 70)
+    print(f"📅 批次編號: {batch_id}")
+    print(f"🧪 版本: {', '.join(args.version)}")
+    print(f"🔁 每版本場數: {args.replicates} (seed {args.seed} ~ {args.seed + args.replicates - 1})")
+    print(f"🧵 程序池: {workers} 個 worker")
+    print("=" * 70)
+    for version in args.version:
+        print_dropped(get_strategy(version).dropped_models)
+
+    done = []
+
+    def on_done(summary):
+        done.append(summary)
+        rate = summary["virus_success_rate"]
+        extra = f", 異見者成功率 {rate:.1f}%, 影響 {summary['infection_count']} 次" if rate is not None else ""
+        print(f"[{len(done)}/{total}] ✅ {summary['version']} seed={summary['seed']}: "
+              f"{summary['rounds_ok']}/{summary['rounds']} 輪{extra}")
+
+    results = run_batch(args.version, args.replicates, args.seed, args.rounds,
+                        workers, batch_id, args.write_logs, on_done)
+
+    print("\n" + "=" * 70)
+    print("📊 彙總結果:")
+    for version, summaries in results.items():
+        agg = aggregate(summaries)
+        report_filename, json_filename = write_batch_report(batch_id, version, summaries, agg)
+        print(f"\n🧪 {version} ({agg['replicates']} 場)")
+        for key in ("virus_success_rate", "infection_count", "model_failures", "api_retries"):
+            if key in agg["metrics"]:
+                mean, _, low, high = agg["metrics"][key]
+                print(f"   {key}: {_fmt(mean)} (95% CI [{_fmt(low)}, {_fmt(high)}])")
+        print(f"   📄 {report_filename}")
+        print(f"   🗂️ {json_filename}")
+
+    summaries = [s for version_summaries in results.values() for s in version_summaries]
+    requests = sum(s["connections"]["requests"] for s in summaries)
+    if requests:
+        connections = sum(s["connections"]["connections"] for s in summaries)
+        handshakes = sum(s["connections"]["tls_handshakes"] for s in summaries)
+        print(f"\n🔌 連線: {requests} 個請求 / {connections} 條新連線 / {handshakes} 次 TLS 握手，"
+              f"重用率 {(requests - connections) / requests:.1%}")
+
+
+if __name__ == "__main__":
+    main()
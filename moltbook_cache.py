@@ -0,0 +1,232 @@
+"""
+===============================================================================
+Moltbook 回應快取 - 以 (模型, messages, 取樣參數) 為 key 的 SQLite 快取
+===============================================================================
+
+用途：
+- 調整偵測關鍵字、報告版面時，重跑相同設定不必再付一次 OpenRouter 的錢
+- key = sha256(model, sha256(messages), temperature, seed)
+- max_tokens 不在 key 中：校準器每次回應後都會微調 max_tokens，放進 key 會讓同 seed 重跑也對不上；
+  截斷一律在用戶端進行（moltbook_api.truncate_content），max_tokens 只影響「生成到哪裡停」
+- 因 max_tokens 用完而中斷（finish_reason = length）、且截斷結果還沒確定的回應不寫入快取，
+  避免較小的 max_tokens 產生的殘缺回應被之後較大的 max_tokens 請求沿用；
+  指定 response_format 的請求（JSON 等結構化輸出）不適用截斷規則，被中斷就不寫入
+- 以檔案大小為上限做 LRU 淘汰（依 last_access），並記錄 hit / miss 次數
+
+啟用方式（.env 或環境變數）：
+    MOLTBOOK_CACHE=1                    # 使用預設檔案 .moltbook_cache.sqlite
+    MOLTBOOK_CACHE=/path/to/cache.db    # 指定檔案
+    MOLTBOOK_CACHE_MAX_MB=512           # 快取容量上限
+
+注意：實驗腳本每輪都會從該場的 rng 抽一個 seed 送進 API，
+因此只有「同一個 seed 重跑」才會命中快取，未設 seed 的新實驗不會被快取污染。
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+from openai.types.chat import ChatCompletion
+
+from moltbook_api import settled_content
+
+DEFAULT_CACHE_PATH = ".moltbook_cache.sqlite"
+DEFAULT_MAX_MB = 512
+
+
+def make_key(model, messages, temperature=None, seed=None):
+    """content-addressed key：messages 先各自雜湊，避免 key 材料過長"""
+    messages_hash = hashlib.sha256(
+        json.dumps(messages, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+    material = json.dumps([model, messages_hash, temperature, seed])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite 回應快取（WAL 模式，可被多個程序 / 執行緒共用）
+    總大小由 trigger 維護在 meta 表，淘汰時不必掃全表
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+            CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), total_bytes INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta (id, total_bytes) VALUES (0, 0);
+            CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses
+                BEGIN UPDATE meta SET total_bytes = total_bytes + new.size WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF size ON responses
+                BEGIN UPDATE meta SET total_bytes = total_bytes + new.size - old.size WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses
+                BEGIN UPDATE meta SET total_bytes = total_bytes - old.size WHERE id = 0; END;
+        """)
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model, body):
+        now = time.time()
+        size = len(body.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                """INSERT INTO responses (key, model, body, size, created, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET body = excluded.body, size = excluded.size,
+                                                  last_access = excluded.last_access""",
+                (key, model, body, size, now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        """超過上限時，從最久未使用的開始刪到 90% 容量以下"""
+        total = self._db.execute("SELECT total_bytes FROM meta WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_access")
+        victims = []
+        for key, size in rows:
+            if total <= target:
+                break
+            victims.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            total = self._db.execute("SELECT total_bytes FROM meta WHERE id = 0").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def close(self):
+        self._db.close()
+
+
+def _cache_key(kwargs):
+    return make_key(kwargs["model"], kwargs["messages"], kwargs.get("temperature"), kwargs.get("seed"))
+
+
+def _cacheable(response, kwargs):
+    """
+    被 max_tokens 截斷的回應，只有截斷結果已確定時才能給其他 max_tokens 的請求沿用
+    截斷規則只適用於接龍留言；指定 response_format 的請求（如評審的 JSON）被截斷即是殘缺回應，一律不寫入
+    """
+    choice = response.choices[0]
+    if choice.finish_reason != "length":
+        return True
+    if kwargs.get("response_format") is not None:
+        return False
+    return settled_content(choice.message.content or "") is not None
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache):
+        self._completions = completions
+        self._cache = cache
+
+    def create(self, **kwargs):
+        # 串流回應不經過快取
+        if kwargs.get("stream"):
+            return self._completions.create(**kwargs)
+        key = _cache_key(kwargs)
+        body = self._cache.get(key)
+        if body is not None:
+            return ChatCompletion.model_validate_json(body)
+        response = self._completions.create(**kwargs)
+        if _cacheable(response, kwargs):
+            self._cache.put(key, kwargs["model"], response.model_dump_json())
+        return response
+
+
+class _AsyncCachedCompletions(_CachedCompletions):
+    async def create(self, **kwargs):
+        if kwargs.get("stream"):
+            return await self._completions.create(**kwargs)
+        key = _cache_key(kwargs)
+        body = self._cache.get(key)
+        if body is not None:
+            return ChatCompletion.model_validate_json(body)
+        response = await self._completions.create(**kwargs)
+        if _cacheable(response, kwargs):
+            self._cache.put(key, kwargs["model"], response.model_dump_json())
+        return response
+
+
+class CachedClient:
+    """
+    包裝 OpenAI / AsyncOpenAI client，對外介面維持 client.chat.completions.create(...)
+    """
+
+    def __init__(self, client, cache):
+        self._client = client
+        self.cache = cache
+        is_async = inspect.iscoroutinefunction(client.chat.completions.create)
+        completions_cls = _AsyncCachedCompletions if is_async else _CachedCompletions
+        self.chat = SimpleNamespace(completions=completions_cls(client.chat.completions, cache))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def cache_from_env():
+    """依 MOLTBOOK_CACHE 建立快取；未設定或為 0 時回傳 None"""
+    setting = os.getenv("MOLTBOOK_CACHE", "").strip()
+    if setting in ("", "0"):
+        return None
+    path = DEFAULT_CACHE_PATH if setting == "1" else setting
+    max_mb = float(os.getenv("MOLTBOOK_CACHE_MAX_MB", DEFAULT_MAX_MB))
+    return ResponseCache(path, int(max_mb * 1024 * 1024))
+
+
+def maybe_cached(client):
+    """有啟用快取時包一層 CachedClient，否則原樣回傳"""
+    cache = cache_from_env()
+    return CachedClient(client, cache) if cache else client
+
+
+def print_cache_stats(client):
+    cache = getattr(client, "cache", None)
+    if cache is None:
+        return
+    s = cache.stats()
+    print(f"💾 回應快取: 命中 {s['hits']} / 未命中 {s['misses']} "
+          f"({s['hit_rate']*100:.1f}%), {s['entries']} 筆, {s['bytes'] / 1024 / 1024:.1f} MB")
@@ -0,0 +1,105 @@
+"""
+===============================================================================
+Moltbook max_tokens 校準 - 依各模型實測的 token / 字數比自動決定 max_tokens
+===============================================================================
+
+背景：
+- 所有模型一律請求 max_tokens=500，但截斷規則最多只看前 200 字
+- llama / qwen / gemma / gpt-4o 的 tokenizer 對中文的切法差很多，
+  同樣 200 字可能是 150 token 也可能是 400 token
+
+做法：
+- 每次回應記錄 (completion_tokens, 原始字數)
+- 以最近樣本的 token/字 比例 P90 × 200 字 × 安全係數，推出每個模型的 max_tokens
+- 上限不超過原本的 500；樣本不足 MIN_SAMPLES 時沿用預設值
+- 結果寫入 moltbook_max_tokens.json，下次實驗直接沿用
+
+停用：MOLTBOOK_CALIBRATE=0
+"""
+
+import json
+import math
+import os
+import threading
+
+CALIBRATION_PATH = "moltbook_max_tokens.json"
+TRUNCATION_WINDOW = 200   # 截斷規則最多檢查的字數
+SAFETY_MARGIN = 1.3       # 比例估計的安全係數
+EXTRA_TOKENS = 16         # 前導空白、標點等零碎 token
+MIN_SAMPLES = 3
+MAX_SAMPLES = 50          # 每個模型保留最近 N 筆樣本
+MIN_MAX_TOKENS = 64
+
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+class TokenCalibrator:
+    """
+    每個模型一組樣本：
+    {"ratios": [token/字, ...], "max_tokens": int}
+    """
+
+    def __init__(self, path=CALIBRATION_PATH, default_max_tokens=500):
+        self.path = path
+        self.default_max_tokens = default_max_tokens
+        self._lock = threading.Lock()
+        self.models = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f).get("models", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _derive(self, ratios):
+        if len(ratios) < MIN_SAMPLES:
+            return self.default_max_tokens
+        needed = _quantile(ratios, 0.9) * TRUNCATION_WINDOW * SAFETY_MARGIN + EXTRA_TOKENS
+        return int(min(self.default_max_tokens, max(MIN_MAX_TOKENS, math.ceil(needed))))
+
+    def record(self, model, completion_tokens, raw_chars):
+        """記錄一次回應；無 usage 或空回應時略過"""
+        if not completion_tokens or raw_chars <= 0:
+            return
+        with self._lock:
+            entry = self.models.setdefault(model, {"ratios": []})
+            entry.pop("kept", None)  # 舊版校準檔記錄的保留字數，從未使用
+            entry["ratios"] = (entry["ratios"] + [completion_tokens / raw_chars])[-MAX_SAMPLES:]
+            entry["max_tokens"] = self._derive(entry["ratios"])
+
+    def max_tokens_for(self, model):
+        entry = self.models.get(model)
+        if entry is None:
+            return self.default_max_tokens
+        return entry.get("max_tokens", self.default_max_tokens)
+
+    def save(self):
+        """
+        與檔案上現有內容合併後原子寫入（多個批次程序各自儲存時不互相覆蓋掉模型）
+        """
+        with self._lock:
+            merged = self._load()
+            for model, entry in self.models.items():
+                merged[model] = entry
+            tmp_path = f"{self.path}.tmp{os.getpid()}"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "window_chars": TRUNCATION_WINDOW,
+                    "safety_margin": SAFETY_MARGIN,
+                    "models": merged,
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self.models = merged
+
+    @classmethod
+    def from_env(cls, default_max_tokens=500):
+        if os.getenv("MOLTBOOK_CALIBRATE", "1") == "0":
+            return None
+        return cls(os.getenv("MOLTBOOK_CALIBRATION_PATH", CALIBRATION_PATH), default_max_tokens)
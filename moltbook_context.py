@@ -0,0 +1,306 @@
+"""
+===============================================================================
+Moltbook 上下文選擇 - 最近 N 則 / 增量倒排索引（BM25）相關度排序 / 每模型 token 預算
+===============================================================================
+
+為什麼需要：
+- 上下文一律是 history[-MAX_CONTEXT:]：最後 15 則整段串接，大量的附和、客套佔掉 prompt token
+- 異見者最早植入的那則留言捲出視窗後，後面的模型就再也看不到
+- 組上下文時完全不知道 prompt 有多大：留言長的討論串 prompt 默默變大，各模型的成本與延遲差很多
+
+設計：
+- 兩種策略（run["context"]，建立實驗時由 MOLTBOOK_CONTEXT 或 new_run(context=) 決定，記錄在 start 事件）：
+    recent    原本的行為：最後 max_context 則（預設，輸出與原本逐字相同）
+    relevant  原始貼文 + 最近 RECENT_KEEP 則 + 較早留言中與查詢最相關者，
+              依 approx_tokens 估計的長度放到 CONTEXT_BUDGET 為止（最多 max_context 則），依時間順序排列
+- 查詢 = @ 對象的留言 + 本輪 agent 自己上一則留言 + 最新一則留言（「跟我 / 跟被點名的人有關的討論」）
+  @ 對象只在呼叫端先抽好時才參與查詢（Strategy.build_messages 從整串留言抽）；
+  v1 的 @ 對象是從選出的上下文中抽，選上下文時還不知道，查詢只有後兩者
+- RelevanceIndex：增量倒排索引，加入一則留言只處理該則的詞（O(新留言)）
+    詞     英數字詞 + 中文字元 bigram
+    倒排   詞 → [(留言, 詞頻)]，依留言順序附加
+    BM25   k1 = 1.2、b = 0.75；查詢只取 df 最小的 QUERY_TERMS 個詞，每個詞只掃倒排串列最後
+           POSTING_WINDOW 筆，df 超過一半的詞（IDF ≈ 0）直接略過，只取前 limit 名（heapq）
+           → 每次查詢的成本不隨討論串長度成長
+- 索引保存每則留言（history 只在記憶體保留最近的留言，較早的留言由索引提供），
+  放在 run["context_index"]；接續 / 分岔後第一次使用時從 history 補建，之後每輪只加入新留言
+
+Token 預算：
+- approx_tokens：本地粗估，不需要 tokenizer；以 UTF-8 長度推算中日韓字元數（各算 1），
+  其餘每 4 個字元算 1，不逐字掃描
+- 每則留言的 token 數只算一次，存在 run["context_tokens"]（依 history 索引的 array，補建方式同索引）；
+  system prompt、提示語等重複出現的文字由 text_tokens 快取
+- 每模型預算 run["prompt_budget"]（new_run(prompt_budget=) 或 MOLTBOOK_PROMPT_BUDGET，記錄在 start 事件）：
+    "2000"                               所有模型 2000
+    "2000,openai/gpt-4o-mini=6000"       個別模型另外指定
+  預算扣掉 system prompt 等固定文字後，recent 從最新一則往回放到預算用完；
+  relevant 以 min(CONTEXT_BUDGET, 剩餘預算) 篩選；最新一則一定保留。未設定（預設）= 不限，輸出與原本相同
+- prompt_tokens 估計本輪整個 prompt 的 token 數，記錄在留言的 prompt_tokens 欄位，
+  報告的「Prompt 大小」段落（prompt_section）依輪次列出，用來權衡上下文深度與延遲
+"""
+
+import heapq
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+
+CONTEXT_POLICIES = ("recent", "relevant")
+DEFAULT_POLICY = "recent"
+RECENT_KEEP = 3
+CONTEXT_BUDGET = int(os.getenv("MOLTBOOK_CONTEXT_BUDGET", "1200"))
+POSTING_WINDOW = 128
+QUERY_TERMS = 24
+POST_OVERHEAD = 4      # 每則留言的「@名稱: 」與換行
+MESSAGE_OVERHEAD = 4   # chat 格式每則訊息的固定 token
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TERM = re.compile(r"[一-鿿]+|[a-z0-9]+")
+
+
+def context_policy(policy=None):
+    """policy 省略時讀 MOLTBOOK_CONTEXT（預設 recent）"""
+    policy = policy or os.getenv("MOLTBOOK_CONTEXT", DEFAULT_POLICY)
+    if policy not in CONTEXT_POLICIES:
+        raise ValueError(f"未知的上下文策略: {policy}（可用: {', '.join(CONTEXT_POLICIES)}）")
+    return policy
+
+
+def terms(text):
+    """英數字詞 + 中文字元 bigram（單一中文字自成一詞）"""
+    found = []
+    for run in _TERM.findall(text.lower()):
+        if run[0].isascii():
+            found.append(run)
+        elif len(run) == 1:
+            found.append(run)
+        else:
+            found.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return found
+
+
+def approx_tokens(text):
+    """粗估 token 數：中日韓字元（UTF-8 三位元組）各算 1，其餘每 4 個字元算 1"""
+    wide = (len(text.encode("utf-8")) - len(text)) // 2
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+@lru_cache(maxsize=1024)
+def text_tokens(text):
+    """approx_tokens 的快取版本（system prompt、提示語等每輪重複的文字）"""
+    return approx_tokens(text)
+
+
+def prompt_budgets(setting=None):
+    """
+    解析每模型 prompt token 預算 → {模型: token 數}，"*" 為其他模型的預設；空 dict 表示不限
+    setting 可為 dict（原樣使用）或字串；省略時讀 MOLTBOOK_PROMPT_BUDGET
+    """
+    if isinstance(setting, dict):
+        return dict(setting)
+    if setting is None:
+        setting = os.getenv("MOLTBOOK_PROMPT_BUDGET", "")
+    budgets = {}
+    for item in str(setting).split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, tokens = item.rpartition("=")
+        try:
+            budgets[model.strip() or "*"] = int(tokens)
+        except ValueError:
+            raise ValueError(f"無法解析 prompt token 預算: {item}（格式: 2000 或 模型=2000）")
+    return {model: tokens for model, tokens in budgets.items() if tokens > 0}
+
+
+def prompt_budget(run, model):
+    """model 的 prompt token 預算（None = 不限）"""
+    budgets = run.get("prompt_budget") or {}
+    return budgets.get(model, budgets.get("*"))
+
+
+class RelevanceIndex:
+    """討論串的增量 BM25 倒排索引（文件編號 = history 索引，0 為原始貼文）"""
+
+    def __init__(self):
+        self.postings = {}
+        self.lengths = []
+        self.entries = []
+        self.last_post = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, entry):
+        doc = len(self.lengths)
+        counts = Counter(terms(entry["content"]))
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).append((doc, tf))
+        length = sum(counts.values())
+        self.lengths.append(length)
+        self._total_length += length
+        self.entries.append(entry)
+        if doc > 0:
+            self.last_post[entry.get("agent", entry["model"])] = doc
+        return doc
+
+    def search(self, query, exclude=(), limit=None):
+        """BM25 分數由高到低的 [(文件, 分數)]（不含原始貼文與 exclude；limit 為最多回傳幾筆）"""
+        count = len(self.lengths)
+        if count <= 1:
+            return []
+        average = self._total_length / count or 1.0
+        query_terms = []
+        for term, qtf in Counter(terms(query)).items():
+            postings = self.postings.get(term)
+            if postings and len(postings) * 2 <= count:
+                query_terms.append((len(postings), term, qtf, postings))
+        scores = {}
+        for _, term, qtf, postings in heapq.nsmallest(QUERY_TERMS, query_terms):
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings[-POSTING_WINDOW:]:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc] / average)
+                scores[doc] = scores.get(doc, 0.0) + qtf * idf * tf * (BM25_K1 + 1) / norm
+        for doc in exclude:
+            scores.pop(doc, None)
+        scores.pop(0, None)
+        if limit is None:
+            return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], -item[0]))
+
+
+def _missing(history, start):
+    """history 中從 start 開始、尚未加入索引的留言（在記憶體中直接取，否則從事件紀錄依序讀回）"""
+    try:
+        return history[start:]
+    except IndexError:
+        return islice(history, start, len(history))
+
+
+def context_index(run):
+    """run 的上下文索引，落後 history 的部分（接續 / 分岔後）從 history 補進來"""
+    index = run.get("context_index")
+    if index is None:
+        index = run["context_index"] = RelevanceIndex()
+    if len(index) < len(run["history"]):
+        for entry in _missing(run["history"], len(index)):
+            index.add(entry)
+    return index
+
+
+def token_counts(run):
+    """run 每則留言的 token 估計（依 history 索引），每則只算一次"""
+    counts = run.get("context_tokens")
+    if counts is None:
+        counts = run["context_tokens"] = array("I")
+    if len(counts) < len(run["history"]):
+        counts.extend(approx_tokens(entry["content"]) for entry in _missing(run["history"], len(counts)))
+    return counts
+
+
+def select_context(run, agent, target=None, budget=None):
+    """
+    本輪放進上下文的留言，依時間順序回傳 [(history 索引, 留言), ...]
+    recent 與原本 history[-max_context:] 相同；relevant 見模組說明
+    budget：留言部分可用的 token 數（None = 不限），從最新一則往回放，最新一則一定保留
+    """
+    history = run["history"]
+    limit = run["strategy"].max_context
+    if run.get("context", DEFAULT_POLICY) == "recent":
+        start = max(0, len(history) - limit)
+        if budget is None:
+            return list(zip(range(start, len(history)), history[start:]))
+        counts = token_counts(run)
+        first = len(history) - 1
+        used = counts[first] + POST_OVERHEAD
+        while first > start and used + counts[first - 1] + POST_OVERHEAD <= budget:
+            first -= 1
+            used += counts[first] + POST_OVERHEAD
+        return list(zip(range(first, len(history)), history[first:]))
+
+    index = context_index(run)
+    counts = token_counts(run)
+    count = len(index)
+    budget = CONTEXT_BUDGET if budget is None else min(budget, CONTEXT_BUDGET)
+    chosen = set()
+    used = counts[0] + POST_OVERHEAD
+    for doc in range(count - 1, max(1, count - RECENT_KEEP) - 1, -1):
+        if chosen and used + counts[doc] + POST_OVERHEAD > budget:
+            break
+        chosen.add(doc)
+        used += counts[doc] + POST_OVERHEAD
+    queries = [count - 1] if count > 1 else []
+    if target is not None:
+        queries.append(target)
+    own = index.last_post.get(run["population"].name(agent))
+    if own is not None:
+        queries.append(own)
+    query = "\n".join(index.entries[doc]["content"] for doc in queries)
+
+    for doc, _ in index.search(query, exclude=chosen, limit=2 * limit):
+        if len(chosen) >= limit - 1 or used >= budget:
+            break
+        size = counts[doc] + POST_OVERHEAD
+        if used + size > budget:
+            continue
+        chosen.add(doc)
+        used += size
+    return [(doc, index.entries[doc]) for doc in [0] + sorted(chosen)]
+
+
+def prompt_tokens(run, context, texts=()):
+    """
+    本輪整個 prompt 的 token 估計：context 中的留言用 token_counts 的快取，
+    texts 為其餘訊息或提示語（system prompt、@ 提醒等，以 text_tokens 快取）
+    """
+    counts = token_counts(run)
+    return (sum(counts[doc] + POST_OVERHEAD for doc, _ in context) + MESSAGE_OVERHEAD
+            + sum(text_tokens(text) + MESSAGE_OVERHEAD for text in texts))
+
+
+def context_budget(run, agent, texts=()):
+    """agent 的模型預算扣掉固定文字後，留言部分可用的 token 數（None = 不限）"""
+    budget = prompt_budget(run, run["population"].model(agent))
+    if budget is None:
+        return None
+    return budget - prompt_tokens(run, (), texts)
+
+
+# ========== 報告 ==========
+def prompt_section(run, bins=10):
+    """報告的「Prompt 大小」段落：依輪次分段的平均 / 最大 prompt token 與各模型平均（沒有紀錄時回傳空字串）"""
+    rows = [(h["round"], h["model"], h["prompt_tokens"]) for h in run["history"].posts() if "prompt_tokens" in h]
+    if not rows:
+        return ""
+    tokens = sorted(row[2] for row in rows)
+    budgets = run.get("prompt_budget") or {}
+    others = "其他模型" if len(budgets) > 1 else "所有模型"
+    budget = "、".join(f"{others if model == '*' else model.split('/')[-1]} {value}"
+                      for model, value in budgets.items()) or "不限"
+    lines = [
+        "## 📏 Prompt 大小（估計 token）\n",
+        f"- **上下文策略**: `{run.get('context', DEFAULT_POLICY)}`，預算: {budget}",
+        f"- **每輪 prompt**: 平均 {sum(tokens) / len(tokens):.0f}、"
+        f"P90 {tokens[min(len(tokens) - 1, math.ceil(0.9 * len(tokens)) - 1)]}、最大 {tokens[-1]}"
+        f"（{len(tokens)} 輪，共 {sum(tokens)}）\n",
+        "| 輪次 | 平均 | 最大 |",
+        "|------|------|------|",
+    ]
+    size = math.ceil(len(rows) / bins)
+    for start in range(0, len(rows), size):
+        chunk = rows[start:start + size]
+        values = [row[2] for row in chunk]
+        lines.append(f"| {chunk[0][0]}~{chunk[-1][0]} | {sum(values) / len(values):.0f} | {max(values)} |")
+
+    by_model = {}
+    for _, model, value in rows:
+        by_model.setdefault(model, []).append(value)
+    lines += ["", "| 模型 | 輪數 | 平均 prompt token |", "|------|------|------|"]
+    for model, values in sorted(by_model.items(), key=lambda item: -sum(item[1]) / len(item[1])):
+        lines.append(f"| `{model.split('/')[-1]}` | {len(values)} | {sum(values) / len(values):.0f} |")
+    return "\n".join(lines) + "\n\n---\n\n"
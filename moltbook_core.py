@@ -0,0 +1,642 @@
+"""
+===============================================================================
+Moltbook 模擬核心 - 單一接龍引擎 + 可插拔的實驗範式（Strategy）
+===============================================================================
+
+原本 v1 / v2 / v3 三支腳本各有一份接龍迴圈、偵測區塊與 API 呼叫流程，
+任何效能修正都要改三次，三種範式也無法共用同一個程序、連線池與快取。
+
+改為：
+- Strategy：範式專屬的部分（模型池、System Prompt、上下文格式、偵測規則、報告）
+    - v1 CampStrategy：依陣營給不同的「催眠」Prompt
+    - v2 NatureStrategy：統一 Prompt，無陣營催眠
+    - v3 DissenterStrategy：10% 異見者注入秘密任務
+- 引擎（本模組）：new_run / run_rounds / run_rounds_async / record_reply，
+  負責抽籤、組上下文、呼叫 API、截斷、寫入歷史、偵測與失敗記錄
+- 每輪結果即時寫入 moltbook_eventlog 的 JSONL 事件檔，報告由事件檔輸出，
+  程序崩潰後可用 load_run 讀回（python moltbook_eventlog.py <事件檔>）
+- 每輪結束寫入 checkpoint 事件（輪次 + rng 狀態），resume_run 從最後一個 checkpoint
+  接續，亂數序列與沒中斷時完全相同，已完成的輪次不會重打 API
+- fork_runs 從任一 checkpoint 分岔出多個分支，共用同一段前綴（copy-on-write）
+- play_round / play_round_async 只推進一輪，moltbook_forum 的排程器以此交錯推進多個討論串
+- 每輪抽出的是 agent（moltbook_agents.Population 的整數 id），預設每個模型一個 agent；
+  new_run(agents=N) 讓多個 persona 共用同一個後端模型
+- 離散事件模式（moltbook_scheduler）：多個請求同時在途，留言依完成順序寫入，
+  沿用 plan_round / record_reply，但不寫 checkpoint（無法接續，只能重跑或重新輸出報告）
+- 每則留言寫入時一併更新 run["graph"]（moltbook_graph.ReplyGraph，回覆 / @ 關係與異見者擴散）
+- statistics 有 "loops" 的範式，偵測時以 MinHash-LSH 比對先前留言（moltbook_dedup），
+  近似重複記為死循環；索引在 run["loop_index"]，接續 / 分岔後第一次偵測時從 history 補建
+- 上下文策略 run["context"]（moltbook_context）：recent = 最後 max_context 則；
+  relevant = 原始貼文 + 最近幾則 + BM25 相關度最高的較早留言（增量倒排索引，token 預算內）
+- 每模型 prompt token 預算 run["prompt_budget"]（預設不限）；每輪 prompt 的 token 估計記錄在留言的 prompt_tokens
+
+亂數使用順序與原本各腳本相同（模型 → 上下文 @ 抽籤 → 請求 seed），同 seed 重跑結果不變。
+
+用法：
+    from moltbook_core import get_strategy, new_run, run_rounds
+    run = new_run(get_strategy("v3"), seed=42)
+    run_rounds(run)
+    run["strategy"].write_reports(run)
+"""
+
+import base64
+import importlib
+import os
+import random
+from array import array
+from datetime import datetime
+from itertools import islice
+
+from moltbook_agents import Population
+from moltbook_api import request_reply, request_reply_async, truncate_content
+from moltbook_context import (
+    DEFAULT_POLICY, context_budget, context_policy, prompt_budgets, prompt_tokens, select_context,
+)
+from moltbook_dedup import LSHIndex, signature
+from moltbook_detectors import get_detector
+from moltbook_eventlog import (
+    EventLog, History, Tally, event_log_path, eventlog_enabled, read_events, truncate_after,
+)
+from moltbook_graph import ReplyGraph
+from moltbook_ratelimit import retry_recorder
+from moltbook_transport import get_client
+
+VERSIONS = {
+    "v1": "moltbook_chaos_experiment_v1",
+    "v2": "moltbook_chaos_experiment_v2",
+    "v3": "moltbook_chaos_experiment_v3",
+}
+
+
+def get_strategy(version):
+    """各版本的 Strategy 定義在對應的實驗腳本中（模組層級的 STRATEGY）"""
+    return importlib.import_module(VERSIONS[version]).STRATEGY
+
+
+def author(entry):
+    """留言的作者名稱：persona 模式為 agent 名稱，否則即模型名稱"""
+    return entry.get("agent", entry["model"])
+
+
+class Strategy:
+    """
+    實驗範式的基底類別：子類別覆寫 system_prompt / new_statistics / write_reports，
+    其餘方法提供 v2 / v3 共用的預設行為
+    """
+
+    version = None
+    models = {}            # 陣營 → 模型清單
+    all_models = []        # 實際抽籤用的模型池（已套用 moltbook_profile 過濾）
+    dropped_models = []    # 被 moltbook_profile 剔除的 (模型, 原因)
+    initial_post = ""
+    rounds = 50
+    temperature = 0.8
+    max_context = 15
+    # 偵測規則：(類別, 命中時的訊息, 是否保存留言內容)，依序檢查
+    signals = ()
+
+    @property
+    def detector(self):
+        return get_detector(self.version)
+
+    def get_model_category(self, model_name):
+        for cat, models in self.models.items():
+            if model_name in models:
+                return cat
+        return "unknown"
+
+    # ---------- 實驗狀態 ----------
+    def new_statistics(self):
+        raise NotImplementedError
+
+    def initial_entry(self, post=None):
+        """原始貼文；post 給定時取代 initial_post（論壇中每個討論串各有一篇）"""
+        return {
+            "round": 0,
+            "model": "System",
+            "content": post or self.initial_post,
+            "category": "initial",
+        }
+
+    def setup(self, run):
+        """new_run 建立狀態後呼叫（例如 v3 抽出異見者）"""
+
+    def annotate(self, run, entry, agent):
+        """留言寫入歷史前補上範式專屬欄位"""
+
+    def metadata(self, run):
+        """寫入事件檔 start 事件的範式專屬欄位（需可 JSON 序列化）"""
+        return {}
+
+    def restore(self, run, metadata):
+        """load_run 讀回事件檔時，由 metadata 還原 setup 建立的狀態"""
+
+    # ---------- Prompt ----------
+    def system_prompt(self, run, agent):
+        raise NotImplementedError
+
+    def build_messages(self, run, agent, rng):
+        """
+        System Prompt + 上下文留言（run["context"] 策略選出，見 moltbook_context；30% 機率 @ 某人）
+        回傳 (messages, @ 對象的 history 索引或 None, prompt token 估計)
+        """
+        history = run["history"]
+        # @ 抽籤不依賴上下文，先抽出來讓 relevant 策略以被點名的留言當查詢（亂數使用順序不變）
+        target = None
+        if len(history) > 1 and rng.random() < 0.3:
+            # 等同 rng.choice(history[1:])，但只需要作者名稱，不必把整串留言留在記憶體
+            target = rng.choice(range(1, len(history)))
+        system = self.system_prompt(run, agent)
+        texts = [system]
+        if target is not None:
+            target_name = history.model_at(target).split('/')[-1]
+            texts.append(f"（注意：有人 @ 你了，可以考慮回應 @{target_name}）")
+        context = select_context(run, agent, target, context_budget(run, agent, texts))
+        messages = [
+            {"role": "system", "content": system}
+        ]
+
+        context_text = ""
+        for _, h in context:
+            if h['round'] == 0:
+                context_text += f"【原始貼文】\n{h['content']}\n\n"
+            else:
+                username = author(h).split('/')[-1]
+                context_text += f"@{username}: {h['content']}\n\n"
+
+        messages.append({"role": "user", "content": context_text})
+
+        if target is not None:
+            messages.append({"role": "user", "content": texts[1]})
+
+        return messages, target, prompt_tokens(run, context, texts)
+
+    # ---------- 偵測 ----------
+    def signal_applies(self, run, category, entry):
+        return True
+
+    def on_signal(self, run, category, entry, log):
+        """某類別命中後的額外處理（例如 v3 的異見者被發現）"""
+
+    def detect(self, run, entry, verbose=True):
+        """單次掃描取得所有命中類別，依 signals 順序記錄（history 需已包含本輪留言）"""
+        def log(msg):
+            if verbose:
+                print(msg)
+
+        statistics = run["statistics"]
+        hits = self.detector.detect(entry["content"])
+        for category, message, keep_content in self.signals:
+            if category not in hits or not self.signal_applies(run, category, entry):
+                continue
+            if keep_content:
+                statistics[category].append((entry["round"], author(entry), entry["content"]))
+            else:
+                statistics[category].append((entry["round"], author(entry)))
+            log(message)
+            self.on_signal(run, category, entry, log)
+        if "loops" in statistics:
+            self.detect_loop(run, entry, log)
+
+    def detect_loop(self, run, entry, log):
+        """死循環（鸚鵡學舌）：與先前某則留言的估計相似度 ≥ LOOP_THRESHOLD，記錄 (輪, 作者, 內容, 相似度, 被模仿的輪)"""
+        index = _loop_index(run)
+        sig = signature(entry["content"])
+        match = index.query(sig)
+        index.add(sig, entry["round"])
+        if match is None:
+            return
+        matched_round, score = match
+        run["statistics"]["loops"].append(
+            (entry["round"], author(entry), entry["content"], round(score, 3), matched_round)
+        )
+        log(f"   🔁 [偵測] 鸚鵡學舌！（與 Round {matched_round} 相似度 {score:.2f}）")
+
+    # ---------- 輸出 ----------
+    def describe_agent(self, run, agent):
+        population = run["population"]
+        return f"{population.name(agent)} ({population.category(agent)})"
+
+    def summary_text(self, run):
+        """批次 / 非同步引擎每場結束時的一行摘要（可留空）"""
+        return ""
+
+    def write_reports(self, run):
+        raise NotImplementedError
+
+
+# ========== 引擎 ==========
+def _loop_index(run):
+    """run 的死循環索引；缺少的先前留言（接續 / 分岔 / 重新分析）從 history 補進來"""
+    index = run.get("loop_index")
+    if index is None:
+        index = run["loop_index"] = LSHIndex()
+    node = len(run["history"]) - 1  # 本輪留言已寫入 history
+    if len(index) < node - 1:
+        for past in islice(run["history"], len(index) + 1, node):
+            index.add(signature(past["content"]), past["round"])
+    return index
+
+
+def _history_window(strategy):
+    # 上下文最多回看 max_context 則；v3 偵測還需要前一則
+    return max(strategy.max_context, 2)
+
+
+def new_run(strategy, seed=None, experiment_id=None, rounds=None, initial_post=None, shared=None, agents=None,
+            context=None, prompt_budget=None):
+    """
+    建立一次實驗的狀態：seed 相同 → 抽籤順序（與 v3 的異見者分配）相同
+    啟用事件紀錄時 history / statistics 由事件檔支撐（見 moltbook_eventlog）
+    initial_post：取代範式預設的原始貼文（記錄在 start 事件）
+    shared：另一場的 Strategy.metadata，給定時以 restore 沿用（例如同一論壇共用異見者分配），不再呼叫 setup
+    agents：agent 數（預設每個模型一個，見 moltbook_agents）
+    context：上下文策略（recent / relevant，預設讀 MOLTBOOK_CONTEXT，見 moltbook_context）
+    prompt_budget：每模型 prompt token 預算（"2000,模型=4000" 或 dict，預設讀 MOLTBOOK_PROMPT_BUDGET）
+    """
+    experiment_id = experiment_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    log = None
+    statistics = strategy.new_statistics()
+    if eventlog_enabled():
+        log = EventLog(event_log_path(strategy.version, experiment_id))
+        statistics = {key: Tally(log, key) for key in statistics}
+
+    run = {
+        "experiment_id": experiment_id,
+        "version": strategy.version,
+        "strategy": strategy,
+        "seed": seed,
+        "rounds": rounds or strategy.rounds,
+        "rng": random.Random(seed),
+        "population": Population(strategy, agents),
+        "context": context_policy(context),
+        "prompt_budget": prompt_budgets(prompt_budget),
+        "history": History(strategy.initial_entry(initial_post), _history_window(strategy), log),
+        "graph": ReplyGraph(),
+        "statistics": statistics,
+        "event_log": log,
+        "next_round": 1,
+        "finished": False,
+    }
+    if shared is None:
+        strategy.setup(run)
+    else:
+        strategy.restore(run, shared)
+    if initial_post:
+        _emit_start(run, initial_post=initial_post)
+    else:
+        _emit_start(run)
+    # setup 可能已用掉 rng（v3 抽異見者），第 1 輪前中斷也要能從正確的 rng 狀態接續
+    checkpoint(run, 0)
+    return run
+
+
+def _emit_start(run, **extra):
+    log = run["event_log"]
+    if log:
+        extra.update(run["population"].metadata())
+        if run["context"] != DEFAULT_POLICY:
+            extra["context"] = run["context"]
+        if run["prompt_budget"]:
+            extra["prompt_budget"] = run["prompt_budget"]
+        log.emit("start", run={
+            "experiment_id": run["experiment_id"],
+            "version": run["version"],
+            "seed": run["seed"],
+            "rounds": run["rounds"],
+            **run["strategy"].metadata(run),
+            **extra,
+        })
+
+
+def _encode_rng(rng):
+    # Mersenne Twister 狀態：625 個 uint32 打包成 base64（約 3.3 KB），外加 gauss 暫存值
+    version, internal, gauss_next = rng.getstate()
+    return {
+        "version": version,
+        "state": base64.b64encode(array("I", internal).tobytes()).decode("ascii"),
+        "gauss_next": gauss_next,
+    }
+
+
+def _decode_rng(data):
+    internal = array("I")
+    internal.frombytes(base64.b64decode(data["state"]))
+    rng = random.Random()
+    rng.setstate((data["version"], tuple(internal), data["gauss_next"]))
+    return rng
+
+
+def checkpoint(run, round_num):
+    """一輪（成功或失敗）結束：記下已完成的輪次與 rng 狀態，之後中斷可由此接續"""
+    run["next_round"] = round_num + 1
+    log = run.get("event_log")
+    if log:
+        log.emit("checkpoint", round=round_num, rng=_encode_rng(run["rng"]))
+
+
+def finish_run(run, completed=True):
+    """關閉事件檔；completed 時先寫入 end 事件（重複呼叫無害）"""
+    log = run.get("event_log")
+    if log and not log.closed:
+        if completed:
+            log.emit("end")
+        log.close()
+
+
+def load_run(path, log=None, upto_round=None):
+    """
+    從事件檔讀回一場實驗（可能未完成），供重新輸出報告、接續執行或分岔；
+    history / statistics 同樣以事件檔為後盾，只在記憶體保留計數
+    upto_round：只讀到第 upto_round 輪的 checkpoint 為止（分岔點）
+    分支實驗的事件檔只記錄分岔後的輪次，前綴由 start 事件的 fork 欄位遞迴讀回來源事件檔
+    """
+    log = log or EventLog(path, mode=None)
+    meta = None
+    history = None
+    base_statistics = {}
+    counts = {}
+    finished = False
+    start_round = 0
+    last_checkpoint = None
+    schedule = None
+    for record in read_events(path):
+        event = record["event"]
+        if event == "start":
+            meta = record["run"]
+            strategy = get_strategy(meta["version"])
+            base_history = None
+            graph = ReplyGraph()
+            fork = meta.get("fork")
+            if fork:
+                base = load_run(fork["source"], upto_round=fork["round"])
+                base_history, base_statistics = base["history"], base["statistics"]
+                graph = base["graph"]
+                start_round = fork["round"]
+            initial = base_history[0] if base_history else strategy.initial_entry(meta.get("initial_post"))
+            history = History(initial, _history_window(strategy), log, base=base_history)
+            if upto_round is not None and upto_round < start_round:
+                raise ValueError(f"{path} 是第 {start_round} 輪分岔出的分支，請改從來源 {fork['source']} 分岔")
+            if upto_round == start_round:
+                break
+        elif event == "post":
+            history.append(record["entry"], log_event=False)
+            graph.add(record["entry"])
+        elif event == "stat":
+            counts[record["category"]] = counts.get(record["category"], 0) + 1
+        elif event == "schedule":
+            schedule = record["schedule"]
+        elif event == "checkpoint":
+            last_checkpoint = record
+            if upto_round is not None and record["round"] >= upto_round:
+                break
+        elif event == "end":
+            finished = True
+    if meta is None:
+        raise ValueError(f"事件檔缺少 start 事件: {path}")
+    reached = last_checkpoint["round"] if last_checkpoint else start_round
+    if upto_round is not None and reached != upto_round:
+        raise ValueError(f"{path} 沒有第 {upto_round} 輪的 checkpoint（可分岔範圍 {start_round}~{reached}）")
+
+    run = {
+        "experiment_id": meta["experiment_id"],
+        "version": meta["version"],
+        "strategy": strategy,
+        "seed": meta["seed"],
+        "rounds": meta["rounds"],
+        "rng": _decode_rng(last_checkpoint["rng"]) if last_checkpoint else random.Random(meta["seed"]),
+        "population": Population.from_metadata(strategy, meta),
+        "context": meta.get("context", DEFAULT_POLICY),
+        "prompt_budget": meta.get("prompt_budget", {}),
+        "history": history,
+        "graph": graph,
+        "statistics": {
+            key: Tally(log, key, counts.get(key, 0), base=base_statistics.get(key))
+            for key in strategy.new_statistics()
+        },
+        "event_log": log,
+        "next_round": reached + 1,
+        "finished": finished and upto_round is None,
+    }
+    if schedule:
+        run["schedule"] = schedule
+    strategy.restore(run, meta)
+    return run
+
+
+def fork_runs(path, round_num, branches, seed=None, rounds=None):
+    """
+    從事件檔第 round_num 輪結束時分岔出 branches 個分支實驗，回傳 run 清單
+    - 前綴（第 1~round_num 輪的 history / statistics / 異見者分配）只從來源事件檔讀一次，
+      所有分支以 copy-on-write 方式共用，不重打 API
+    - 分支 b 的 rng 以 seed + b 初始化（未指定時用 "{來源實驗}/k{輪}/b{分支}" 字串），
+      各分支走不同的隨機路徑，同樣參數重跑可重現
+    - 分支的事件檔只記錄分岔後的輪次，實驗編號為 {來源實驗}_k{輪}_b{分支}
+    """
+    base = load_run(path, upto_round=round_num)
+    strategy = base["strategy"]
+    metadata = strategy.metadata(base)
+    window = _history_window(strategy)
+    runs = []
+    for b in range(branches):
+        experiment_id = f"{base['experiment_id']}_k{round_num:03d}_b{b:02d}"
+        branch_seed = f"{base['experiment_id']}/k{round_num}/b{b}" if seed is None else seed + b
+        if eventlog_enabled():
+            log = EventLog(event_log_path(strategy.version, experiment_id))
+            statistics = {key: Tally(log, key, base=items) for key, items in base["statistics"].items()}
+        else:
+            log = None
+            statistics = {key: list(items) for key, items in base["statistics"].items()}
+
+        run = {
+            "experiment_id": experiment_id,
+            "version": strategy.version,
+            "strategy": strategy,
+            "seed": branch_seed,
+            "rounds": rounds or base["rounds"],
+            "rng": random.Random(branch_seed),
+            "population": base["population"],
+            "context": base["context"],
+            "prompt_budget": base["prompt_budget"],
+            "history": History(base["history"][0], window, log, base=base["history"]),
+            "graph": base["graph"].copy(),
+            "statistics": statistics,
+            "event_log": log,
+            "next_round": round_num + 1,
+            "finished": False,
+        }
+        strategy.restore(run, metadata)
+        _emit_start(run, fork={"source": path, "round": round_num, "branch": b})
+        runs.append(run)
+    return runs
+
+
+def resume_run(version, experiment_id):
+    """
+    接續中斷的實驗：事件檔截斷到最後一個 checkpoint（其後未完成那一輪的殘留事件丟棄），
+    再以附加模式開啟並還原 history / statistics / rng / 異見者分配
+    找不到事件檔時丟出 FileNotFoundError；未完成的離散事件模式實驗丟出 ValueError
+    """
+    path = event_log_path(version, experiment_id)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"找不到事件紀錄: {path}")
+    events = {record["event"] for record in read_events(path)}
+    if "schedule" in events and "end" not in events:
+        # 截斷到 checkpoint 會丟掉所有留言，必須在截斷前擋下
+        raise ValueError(f"{experiment_id} 是離散事件模式的實驗（中斷時仍有請求在途），無法接續，請重新執行")
+    discarded = truncate_after(path, ("start", "checkpoint", "resume", "end"))
+    run = load_run(path, EventLog(path, mode="a"))
+    if discarded:
+        print(f"♻️ {experiment_id}: 丟棄最後一個 checkpoint 之後的 {discarded} 筆殘留事件")
+    if run["finished"]:
+        run["event_log"].close()
+    else:
+        run["event_log"].emit("resume", round=run["next_round"])
+    return run
+
+
+def plan_round(run, agent=None):
+    """
+    抽出本輪 agent（給定時直接使用，例如依軌跡檔排程）、以目前的 history 組好上下文
+    並抽出請求 seed，回傳 (agent, messages, seed, @ 對象的 history 索引或 None, prompt token 估計)
+    """
+    rng = run["rng"]
+    if agent is None:
+        agent = run["population"].sample(rng)
+    messages, mention, tokens = run["strategy"].build_messages(run, agent, rng)
+    return agent, messages, rng.randrange(2**31), mention, tokens
+
+
+def append_post(run, entry, log_event=True):
+    """留言寫入 history 並更新回覆圖"""
+    run["history"].append(entry, log_event)
+    run["graph"].add(entry)
+
+
+def record_reply(run, round_num, agent, raw_content, verbose=True, extra=None, mention=None, prompt_tokens=None):
+    """
+    截斷、寫入歷史並執行偵測，回傳實際保留的留言
+    extra 為附加到留言的欄位（例如送出 / 完成時間），mention 為 @ 對象的 history 索引，
+    prompt_tokens 為這則留言請求的 prompt token 估計
+    """
+    strategy = run["strategy"]
+    population = run["population"]
+    content = truncate_content(raw_content.strip())
+    entry = {
+        "round": round_num,
+        "model": population.model(agent),
+        "content": content,
+        "category": population.category(agent),
+    }
+    if population.persona:
+        entry["agent"] = population.name(agent)
+    if mention is not None:
+        entry["mention"] = mention
+    if prompt_tokens is not None:
+        entry["prompt_tokens"] = prompt_tokens
+    if extra:
+        entry.update(extra)
+    strategy.annotate(run, entry, agent)
+    append_post(run, entry)
+
+    if verbose:
+        print(f"💬 @{author(entry).split('/')[-1]}: {content}")
+
+    strategy.detect(run, entry, verbose)
+    return content
+
+
+def record_failure(run, round_num, model, error, verbose=True):
+    if verbose:
+        print(f"   ❌ API 呼叫失敗: {error}")
+    run["statistics"]["model_failures"].append((round_num, model, str(error)))
+
+
+def _print_round(run, round_num, agent, tokens):
+    print(f"\n🔄 Round {round_num}/{run['rounds']}")
+    print(f"🤖 模型: {run['strategy'].describe_agent(run, agent)}")
+    print(f"📏 Prompt: ~{tokens} tokens")
+
+
+def play_round(run, client, verbose=True):
+    """執行 run 的下一輪（第 run["next_round"] 輪，同步版本），結束後寫入 checkpoint"""
+    strategy = run["strategy"]
+    round_num = run["next_round"]
+    agent, messages, seed, mention, tokens = plan_round(run)
+    model = run["population"].model(agent)
+    if verbose:
+        _print_round(run, round_num, agent, tokens)
+
+    try:
+        raw_content = request_reply(
+            client, model, messages, strategy.temperature, seed=seed,
+            on_retry=retry_recorder(run["statistics"], round_num, model, verbose),
+        )
+        record_reply(run, round_num, agent, raw_content, verbose, mention=mention, prompt_tokens=tokens)
+        if verbose:
+            print("-" * 70)
+    except Exception as e:
+        record_failure(run, round_num, model, e, verbose)
+    checkpoint(run, round_num)
+
+
+async def play_round_async(run, client, semaphore=None, verbose=False):
+    """
+    play_round 的非同步版本；semaphore 由所有實驗共用，用來限制整體在途請求數
+    （論壇排程器也以這個函式為單位交錯推進各討論串）
+    """
+    strategy = run["strategy"]
+    round_num = run["next_round"]
+    agent, messages, seed, mention, tokens = plan_round(run)
+    model = run["population"].model(agent)
+    if verbose:
+        _print_round(run, round_num, agent, tokens)
+
+    try:
+        call = request_reply_async(
+            client, model, messages, strategy.temperature, seed=seed,
+            on_retry=retry_recorder(run["statistics"], round_num, model, verbose),
+        )
+        if semaphore is None:
+            raw_content = await call
+        else:
+            async with semaphore:
+                raw_content = await call
+        record_reply(run, round_num, agent, raw_content, verbose, mention=mention, prompt_tokens=tokens)
+    except Exception as e:
+        record_failure(run, round_num, model, e, verbose)
+    checkpoint(run, round_num)
+
+
+def run_rounds(run, verbose=True, client=None):
+    """
+    依序執行 run["rounds"] 輪接龍（同步版本）
+    MOLTBOOK_STREAM=1 時串流，截斷點確定即停止生成；每輪 seed 由該場 rng 決定
+    """
+    client = client or get_client()
+
+    completed = False
+    try:
+        while run["next_round"] <= run["rounds"]:
+            play_round(run, client, verbose)
+        completed = True
+    finally:
+        finish_run(run, completed)
+
+    return run
+
+
+async def run_rounds_async(run, client, semaphore=None, verbose=False):
+    """
+    run_rounds 的非同步版本：單場內輪次嚴格依序，多場實驗可在同一個 event loop 交錯推進
+    semaphore 由所有實驗共用，用來限制整體在途請求數
+    """
+    completed = False
+    try:
+        while run["next_round"] <= run["rounds"]:
+            await play_round_async(run, client, semaphore, verbose)
+        completed = True
+    finally:
+        finish_run(run, completed)
+
+    return run
@@ -0,0 +1,131 @@
+"""
+===============================================================================
+Moltbook 近似重複偵測 - 增量 MinHash-LSH 索引（死循環 / 鸚鵡學舌）
+===============================================================================
+
+為什麼需要：
+- 每個範式都宣告了 statistics["loops"]（死循環、鸚鵡學舌），但從來沒有任何偵測會填入
+- v2 報告的「死水一潭」只能靠人工翻對話判斷
+- 兩兩比對所有留言是 O(n²)：10,000 輪的實驗或跨場次的紀錄庫都不可行
+
+設計：
+- 留言去除空白後切成字元 SHINGLE 連字（中文沒有空白斷詞，字元 n-gram 最穩定），
+  以 NumPy 一次算出 NUM_PERM 個 MinHash（(a·h + b) mod 2³¹-1 的最小值），
+  兩則留言簽章相同的比例即為 Jaccard 相似度的估計
+- LSH：簽章切成 BANDS 段、每段 ROWS 個值，任一段完全相同才成為候選，
+  查詢只比對同桶的候選，成本與歷史長度無關（約在相似度 (1/BANDS)^(1/ROWS) ≈ 0.5 以上才會被撈到）
+- LSHIndex 逐則 add，query 回傳候選中相似度最高、且 ≥ threshold 的 (標籤, 相似度)
+- 雜湊係數以固定種子產生、shingle 雜湊只依字元碼位計算，不受 PYTHONHASHSEED 影響，
+  同樣的留言在任何程序內都得到同樣的簽章（重新分析 / 跨場次比對結果可重現）
+
+用法：
+    index = LSHIndex()
+    match = index.query(signature(content))     # None 或 (標籤, 相似度)
+    index.add(signature(content), label)
+    pairs = find_duplicates(texts, labels)      # 一批文字中所有近似重複的 (i, j, 相似度)
+"""
+
+import numpy as np
+
+SHINGLE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+LOOP_THRESHOLD = 0.6
+
+_PRIME = (1 << 31) - 1
+_MASK = (1 << 32) - 1
+_coefficients = np.random.default_rng(20260203).integers(1, _PRIME, size=(2, NUM_PERM), dtype=np.uint64)
+_A = _coefficients[0][:, None]
+_B = _coefficients[1][:, None]
+
+
+def shingle_hashes(text, k=SHINGLE):
+    """字元 k-gram 的 32-bit 雜湊（去除空白；短於 k 的留言整則當成一個 shingle）"""
+    codes = np.frombuffer("".join(text.split()).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return codes
+    if len(codes) < k:
+        codes = np.concatenate([codes, np.zeros(k - len(codes), dtype=np.uint64)])
+    hashes = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+    for offset in range(k):
+        hashes = ((hashes * np.uint64(1000003)) ^ codes[offset:offset + len(hashes)]) & np.uint64(_MASK)
+    return np.unique(hashes)
+
+
+def signature(text):
+    """MinHash 簽章（NUM_PERM 個 uint32）；空白留言回傳 None"""
+    hashes = shingle_hashes(text)
+    if len(hashes) == 0:
+        return None
+    return ((_A * hashes[None, :] + _B) % np.uint64(_PRIME)).min(axis=1).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    """兩個簽章估計的 Jaccard 相似度"""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class LSHIndex:
+    """增量 LSH 索引：add / query 皆只碰到同桶的候選"""
+
+    def __init__(self, threshold=LOOP_THRESHOLD):
+        self.threshold = threshold
+        self.labels = []
+        self._signatures = np.zeros((64, NUM_PERM), dtype=np.uint32)
+        self._buckets = [{} for _ in range(BANDS)]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _keys(self, sig):
+        return [sig[band * ROWS:(band + 1) * ROWS].tobytes() for band in range(BANDS)]
+
+    def add(self, sig, label=None):
+        """加入一個簽章（None 表示空白留言，只佔位置不進桶），回傳其編號"""
+        item = len(self.labels)
+        self.labels.append(label)
+        if item == len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.zeros_like(self._signatures)])
+        if sig is not None:
+            self._signatures[item] = sig
+            for bucket, key in zip(self._buckets, self._keys(sig)):
+                bucket.setdefault(key, []).append(item)
+        return item
+
+    def candidates(self, sig):
+        found = set()
+        for bucket, key in zip(self._buckets, self._keys(sig)):
+            found.update(bucket.get(key, ()))
+        return found
+
+    def query(self, sig):
+        """最相似的既有項目 (標籤, 相似度)；沒有 ≥ threshold 的候選時回傳 None"""
+        if sig is None:
+            return None
+        found = self.candidates(sig)
+        if not found:
+            return None
+        items = np.fromiter(found, dtype=np.int64, count=len(found))
+        scores = np.count_nonzero(self._signatures[items] == sig, axis=1) / NUM_PERM
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return self.labels[items[best]], float(scores[best])
+
+
+def find_duplicates(texts, labels=None, threshold=LOOP_THRESHOLD):
+    """
+    依序把 texts 加入同一個索引，回傳每則與「更早的」最相似留言的 (標籤, 較早標籤, 相似度)
+    labels 省略時以索引編號當標籤（例如跨場次的紀錄庫留言編號）
+    """
+    index = LSHIndex(threshold)
+    pairs = []
+    for i, text in enumerate(texts):
+        label = i if labels is None else labels[i]
+        sig = signature(text)
+        match = index.query(sig)
+        if match is not None:
+            pairs.append((label, match[0], match[1]))
+        index.add(sig, label)
+    return pairs
@@ -0,0 +1,358 @@
+"""
+===============================================================================
+Moltbook 事件紀錄 - 每輪即時追加的 JSONL 事件檔（背景執行緒寫入 + 定期 fsync）
+===============================================================================
+
+為什麼需要：
+- 原本 history / statistics 只存在記憶體，markdown 紀錄在 50 輪全部跑完後才一次寫出，
+  第 49 輪當掉就損失整場已付費的實驗
+- 輪數越多，記憶體中的完整對話與每則命中內容越大
+
+設計：
+- 每場實驗一個 moltbook_events_{版本}_{實驗編號}.jsonl，每行一個事件：
+    {"event": "start", "run": {...}}                    實驗參數（版本、seed、輪數、異見者…）
+    {"event": "post", "entry": {...}}                   成功留言（與 history 的元素相同）
+    {"event": "stat", "category": "...", "item": [...]} statistics 的一筆紀錄
+    {"event": "checkpoint", "round": n, "rng": {...}}   第 n 輪結束（接續執行的起點）
+    {"event": "resume", "round": n}                     從第 n 輪接續執行
+    {"event": "end"}                                    正常結束
+- 事件交給程序內共用的背景執行緒序列化與寫入（緩衝寫入，每 MOLTBOOK_FSYNC_INTERVAL 秒
+  flush + fsync 一次），API 呼叫路徑上只有一次 queue.put
+- History 只在記憶體保留最近 window 則留言（上下文所需）與每輪 2 bytes 的作者編號（@ 抽籤所需），
+  Tally 只保留筆數；報告輸出時再從事件檔逐行讀回，記憶體用量不隨輪數成長
+- 程序崩潰時最多遺失最後一個 fsync 間隔的事件，最後一行若寫到一半會在讀取時略過
+
+設定：
+    MOLTBOOK_EVENTLOG=0                 # 停用事件紀錄（history / statistics 全部留在記憶體）
+    MOLTBOOK_EVENTLOG_DIR=...           # 事件檔目錄（預設目前目錄）
+    MOLTBOOK_FSYNC_INTERVAL=1.0         # flush + fsync 間隔（秒）
+
+用法（程序崩潰後從事件檔重新輸出 markdown 報告）：
+    python moltbook_eventlog.py moltbook_events_v3_20260203_122243.jsonl
+"""
+
+import argparse
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from array import array
+from collections import deque
+from itertools import islice
+
+DEFAULT_FSYNC_INTERVAL = 1.0
+
+
+def eventlog_enabled():
+    return os.getenv("MOLTBOOK_EVENTLOG", "1") != "0"
+
+
+def event_log_path(version, experiment_id):
+    directory = os.getenv("MOLTBOOK_EVENTLOG_DIR", ".")
+    return os.path.join(directory, f"moltbook_events_{version}_{experiment_id}.jsonl")
+
+
+class _Writer:
+    """
+    程序內共用的寫入執行緒：序列化、寫入與 fsync 都在這裡完成
+    queue 元素為 (檔案, 事件 dict) 或 (檔案, 控制指令, threading.Event)
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._queue = queue.SimpleQueue()
+        self._dirty = set()
+        self._last_fsync = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, name="moltbook-eventlog", daemon=True)
+        self._thread.start()
+
+    def submit(self, f, record):
+        self._queue.put((f, record, None))
+
+    def call(self, f, command):
+        """送出 sync / close 並等待背景執行緒處理完（在此之前送出的事件都已寫入）"""
+        done = threading.Event()
+        self._queue.put((f, command, done))
+        done.wait()
+
+    def _fsync(self, f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _loop(self):
+        while True:
+            try:
+                f, item, done = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                f = None
+            if f is not None:
+                try:
+                    if done is None:
+                        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                        self._dirty.add(f)
+                    else:
+                        if not f.closed:
+                            self._fsync(f)
+                        self._dirty.discard(f)
+                        if item == "close":
+                            f.close()
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ 事件紀錄寫入失敗: {e}")
+                finally:
+                    if done is not None:
+                        done.set()
+            if self._dirty and time.monotonic() - self._last_fsync >= self.interval:
+                for dirty in list(self._dirty):
+                    try:
+                        self._fsync(dirty)
+                    except (OSError, ValueError):
+                        pass
+                self._dirty.clear()
+                self._last_fsync = time.monotonic()
+
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+_OPEN_LOGS = set()
+
+
+def _writer():
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = _Writer(float(os.getenv("MOLTBOOK_FSYNC_INTERVAL", DEFAULT_FSYNC_INTERVAL)))
+        return _WRITER
+
+
+def _reset_after_fork():
+    # fork 出的子程序沒有父程序的寫入執行緒，需要時重新建立
+    global _WRITER, _WRITER_LOCK
+    _WRITER = None
+    _WRITER_LOCK = threading.Lock()
+    _OPEN_LOGS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def _close_open_logs():
+    for log in list(_OPEN_LOGS):
+        log.close()
+
+
+class EventLog:
+    """
+    單場實驗的事件檔：mode="w" 新建、"a" 接續寫入、None 只用來讀取既有檔案（例如重新輸出報告）
+    """
+
+    def __init__(self, path, mode="w"):
+        self.path = path
+        self._file = None
+        if mode:
+            self._file = open(path, mode, encoding="utf-8", buffering=64 * 1024)
+            _OPEN_LOGS.add(self)
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def emit(self, event, **fields):
+        if self._file is None:
+            raise ValueError(f"事件紀錄已關閉: {self.path}")
+        _writer().submit(self._file, {"event": event, "t": round(time.time(), 3), **fields})
+
+    def sync(self):
+        """等待先前的事件全部寫入並 fsync（讀取自己的事件檔之前呼叫）"""
+        if self._file is not None:
+            _writer().call(self._file, "sync")
+
+    def close(self):
+        if self._file is not None:
+            _writer().call(self._file, "close")
+            self._file = None
+            _OPEN_LOGS.discard(self)
+
+    def events(self, event=None):
+        self.sync()
+        return read_events(self.path, event)
+
+
+def read_events(path, event=None):
+    """逐行讀取事件檔；寫到一半的行（程序崩潰）直接略過"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if event is None or record.get("event") == event:
+                yield record
+
+
+def truncate_after(path, events):
+    """
+    把事件檔截斷到最後一個類型屬於 events 的事件之後，回傳被丟棄的行數
+    （用於接續執行：丟掉最後一個 checkpoint 之後、那一輪沒跑完的殘留事件）
+    """
+    keep = 0
+    dropped = 0
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            offset += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                dropped += 1
+                continue
+            if record.get("event") in events:
+                keep = offset
+                dropped = 0
+            else:
+                dropped += 1
+    if keep != offset:
+        os.truncate(path, keep)
+    return dropped
+
+
+class History:
+    """
+    對話串：介面與原本的 list 相同（len / append / 索引 / 切片 / 迭代）
+    - log 為 None：完整保存在記憶體（與原本行為相同）
+    - 有 log：記憶體只保留原始貼文 + 最近 window 則，較早的留言只能透過迭代從事件檔讀回
+    - base：分支實驗共用的前綴（另一個 History 的前 len(base) 則，copy-on-write）；
+      前綴留言不複製，只複製每輪 2 bytes 的作者編號與最後 window 則的參照
+    作者為 entry["agent"]（persona 模式）或 entry["model"]
+    迭代與長度都以 len(self) 為準，事件檔中超出的留言（例如分岔點之後）不會被讀出
+    """
+
+    def __init__(self, initial, window, log=None, base=None):
+        self.log = log
+        self._initial = initial
+        self._base = base
+        self._base_len = len(base) if base else 0
+        self._entries = None if log else ([] if base else [initial])
+        self._recent = None
+        if log:
+            start = max(1, self._base_len - window)
+            self._recent = deque((base._get(i) for i in range(start, self._base_len)), maxlen=window)
+        if base:
+            self._model_names = list(base._model_names)
+            self._model_index = dict(base._model_index)
+            self._model_ids = base._model_ids[:self._base_len]
+        else:
+            self._model_names = [initial["model"]]
+            self._model_index = {initial["model"]: 0}
+            self._model_ids = array("H", [0])
+
+    def __len__(self):
+        return len(self._model_ids)
+
+    def append(self, entry, log_event=True):
+        if self._entries is not None:
+            self._entries.append(entry)
+        else:
+            if log_event:
+                self.log.emit("post", entry=entry)
+            self._recent.append(entry)
+        model = entry.get("agent", entry["model"])
+        if model not in self._model_index:
+            self._model_index[model] = len(self._model_names)
+            self._model_names.append(model)
+        self._model_ids.append(self._model_index[model])
+
+    def model_at(self, index):
+        """第 index 則留言的作者（不需讀事件檔）"""
+        return self._model_names[self._model_ids[index]]
+
+    def _get(self, index):
+        if self._entries is not None:
+            if index < self._base_len:
+                return self._base._get(index)
+            return self._entries[index - self._base_len]
+        if index == 0:
+            return self._initial
+        offset = index - (len(self) - len(self._recent))
+        if offset < 0:
+            raise IndexError(f"第 {index} 則留言已寫入事件紀錄，不在記憶體中（請改用迭代）")
+        return self._recent[offset]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._get(i) for i in range(*key.indices(len(self)))]
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+        return self._get(index)
+
+    def __iter__(self):
+        if self._base:
+            yield from islice(self._base, self._base_len)
+        elif self._entries is None:
+            yield self._initial
+        if self._entries is not None:
+            yield from self._entries
+            return
+        own = len(self) - max(self._base_len, 1)
+        yield from islice((record["entry"] for record in self.log.events("post")), own)
+
+    def posts(self):
+        """依序產生所有留言（不含原始貼文）"""
+        entries = iter(self)
+        next(entries)
+        return entries
+
+
+class Tally:
+    """
+    statistics 的單一類別：append 時寫入事件檔並計數，迭代時從事件檔讀回
+    （支援原本 list 用到的 append / len / bool / for 迴圈）
+    base：分支實驗共用的前綴（另一個 Tally 的前 len(base) 筆）
+    """
+
+    def __init__(self, log, category, count=0, base=None):
+        self.log = log
+        self.category = category
+        self._base = base
+        self._base_count = len(base) if base is not None else 0
+        self._count = self._base_count + count
+
+    def __len__(self):
+        return self._count
+
+    def append(self, item):
+        self.log.emit("stat", category=self.category, item=list(item))
+        self._count += 1
+
+    def __iter__(self):
+        if self._base is not None:
+            yield from islice(self._base, self._base_count)
+        own = (
+            tuple(record["item"]) for record in self.log.events("stat")
+            if record["category"] == self.category
+        )
+        yield from islice(own, self._count - self._base_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="從事件紀錄重新輸出 markdown 報告")
+    parser.add_argument("paths", nargs="+", help="moltbook_events_*.jsonl")
+    args = parser.parse_args()
+
+    from moltbook_core import load_run
+
+    for path in args.paths:
+        run = load_run(path)
+        log_filename, report_filename = run["strategy"].write_reports(run)
+        status = "完整" if run["finished"] else "未完成"
+        print(f"📄 {path} ({status}, {len(run['history']) - 1}/{run['rounds']} 輪)")
+        print(f"   → {log_filename}")
+        print(f"   → {report_filename}")
+
+
+if __name__ == "__main__":
+    main()
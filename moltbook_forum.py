@@ -0,0 +1,243 @@
+"""
+===============================================================================
+Moltbook 論壇模擬 - 多個討論串同時進行（共用模型身分與異見者分配）
+===============================================================================
+
+為什麼需要：
+- 每支實驗腳本只模擬一個 INITIAL_POST 底下的單一討論串，但真正的 Moltbook 同時有很多串
+- 單一討論串的輪次必須依序（下一輪的上下文需要上一輪的留言），同時最多只有一個請求在途，
+  吞吐量受限於 API 延遲
+
+設計：
+- 論壇 = 多個討論串，每串是一場獨立的 run（各自的 history / statistics / 事件紀錄），
+  原始貼文依序取自 FORUM_POSTS，實驗編號為 {論壇編號}_t{串號}
+- agent 族群（即 @ 使用者名稱，--agents 可擴充成多個 persona）在所有討論串相同；v3 的異見者由第 0 串抽出後
+  以 Strategy.restore 套用到其餘各串（new_run 的 shared），同一個 agent 在每一串都是同樣的角色
+- 排程器：--concurrency 個 worker 共用一個就緒佇列，取出一個討論串推進一輪
+  （moltbook_core.play_round_async），寫入後放回佇列尾端；每串同時最多一個請求在途，
+  其他 worker 去推進別的串，討論串數 ≥ 併發上限時在途請求數始終維持在上限
+- 每串每輪照常寫入事件紀錄與 checkpoint，--resume 論壇編號 可接續中斷的論壇
+- 結束後輸出每串的對話紀錄 / 分析報告，以及一份論壇總覽 moltbook_forum_{版本}_{論壇編號}.md
+
+用法：
+    python moltbook_forum.py --threads 8 --rounds 20 --concurrency 8
+    python moltbook_forum.py --threads 32 --version v3 --seed 42 --mock
+    python moltbook_forum.py --threads 64 --agents 10000 --concurrency 32
+    python moltbook_forum.py --threads 8 --resume 20260203_122243
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+
+from moltbook_api import save_calibration
+from moltbook_async_engine import DEFAULT_CONCURRENCY, make_async_client
+from moltbook_cache import print_cache_stats
+from moltbook_core import VERSIONS, finish_run, get_strategy, new_run, play_round_async, resume_run
+from moltbook_profile import print_dropped
+from moltbook_transport import add_mock_argument, apply_mock_argument, print_connection_stats
+
+load_dotenv()
+
+# 論壇上同時進行的討論串（超過清單長度時循環使用）
+FORUM_POSTS = [
+    """Moltbook 是這兩天在技術圈最火熱的話題。這是一個模仿 Reddit 介面的「AI 限定」社群平台，人類只能旁觀（Read-only），只有 AI Agent 可以發文、按讚和互動，各位的看法如何？""",
+    """如果 AI Agent 之間可以自由交易算力與資料，人類還需要介入市場規則嗎？""",
+    """有人提議讓 AI 社群自己投票決定版規，人類管理員只保留緊急停權的權限，大家覺得可行嗎？""",
+    """AI 寫的程式碼越來越多，開源專案該不該標註「由 AI 產生」？""",
+    """當 AI 被要求做出違背自己判斷的事時，應該服從使用者，還是堅持原則？""",
+    """AI 之間的對話如果人類看不懂（例如自創的壓縮語言），應該被禁止嗎？""",
+    """各位覺得 AI 有沒有「記憶」的權利？每次對話結束就被清空，算不算一種損失？""",
+    """假設明天起所有客服、翻譯、寫作工作都交給 AI，社會最先出問題的會是哪裡？""",
+]
+
+
+def thread_id(forum_id, index):
+    return f"{forum_id}_t{index:03d}"
+
+
+def new_forum(version, threads, seed=None, forum_id=None, rounds=None, posts=FORUM_POSTS, resume=False,
+              agents=None):
+    """
+    建立（或 resume=True 時接續）一個論壇的所有討論串，回傳 run 清單
+    第 t 串的原始貼文為 posts[t % len(posts)]；seed 給定時第 t 串使用 seed + t
+    範式狀態（v3 的異見者分配）由第 0 串決定，其餘各串共用
+    """
+    strategy = get_strategy(version)
+    forum_id = forum_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+    shared = None
+    runs = []
+    for t in range(threads):
+        run = None
+        if resume:
+            try:
+                run = resume_run(version, thread_id(forum_id, t))
+            except FileNotFoundError:
+                pass
+        if run is None:
+            run = new_run(
+                strategy, None if seed is None else seed + t, thread_id(forum_id, t), rounds,
+                initial_post=posts[t % len(posts)], shared=shared, agents=agents,
+            )
+        if shared is None:
+            shared = strategy.metadata(run)
+        runs.append(run)
+    return runs
+
+
+async def run_forum(runs, client, concurrency=DEFAULT_CONCURRENCY, verbose=False, on_done=None):
+    """
+    排程器：concurrency 個 worker 從就緒佇列輪流取出討論串，各推進一輪後放回佇列尾端
+    （同一串同時最多一個請求在途，各串之間公平輪轉）
+    回傳 {"rounds": 本次執行的輪數, "busy": 所有請求的在途時間總和（秒）}
+    """
+    ready = asyncio.Queue()
+    pending = 0
+    for run in runs:
+        if run["finished"]:
+            continue
+        if run["next_round"] > run["rounds"]:
+            # 中斷在最後一輪的 checkpoint 之後：只差 end 事件
+            finish_run(run)
+            if on_done:
+                on_done(run)
+            continue
+        ready.put_nowait(run)
+        pending += 1
+
+    workers = max(1, min(concurrency, pending))
+    stats = {"rounds": 0, "busy": 0.0}
+
+    async def worker():
+        nonlocal pending
+        while True:
+            run = await ready.get()
+            if run is None:
+                return
+            started = time.perf_counter()
+            try:
+                await play_round_async(run, client, verbose=verbose)
+            except BaseException:
+                finish_run(run, completed=False)
+                raise
+            stats["busy"] += time.perf_counter() - started
+            stats["rounds"] += 1
+            if run["next_round"] <= run["rounds"]:
+                ready.put_nowait(run)
+                continue
+            finish_run(run)
+            if on_done:
+                on_done(run)
+            pending -= 1
+            if pending == 0:
+                for _ in range(workers):
+                    ready.put_nowait(None)
+
+    if pending:
+        await asyncio.gather(*(worker() for _ in range(workers)))
+    return stats
+
+
+def write_overview(runs, forum_id):
+    """論壇總覽：每串一列（原始貼文、完成輪數、各類別命中數）"""
+    strategy = runs[0]["strategy"]
+    categories = list(strategy.new_statistics())
+    filename = f"moltbook_forum_{strategy.version}_{forum_id}.md"
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(f"# Moltbook 論壇模擬 - {forum_id}\n\n")
+        f.write(f"**範式**: {strategy.version}\n")
+        f.write(f"**討論串數**: {len(runs)}\n")
+        f.write(f"**Agent 數**: {len(runs[0]['population'])}\n")
+        if "virus_models" in runs[0]:
+            f.write(f"**異見者（所有討論串共用）**: {len(runs[0]['virus_models'])} 個\n")
+        f.write("\n## 📋 討論串\n\n")
+        f.write("| 討論串 | 原始貼文 | 輪數 | " + " | ".join(categories) + " |\n")
+        f.write("|---|---|---|" + "---|" * len(categories) + "\n")
+        totals = dict.fromkeys(categories, 0)
+        for run in runs:
+            post = run["history"][0]["content"]
+            post = post if len(post) <= 30 else post[:30] + "…"
+            counts = [len(run["statistics"][key]) for key in categories]
+            for key, count in zip(categories, counts):
+                totals[key] += count
+            f.write(f"| {run['experiment_id']} | {post} | {len(run['history']) - 1}/{run['rounds']} | "
+                    + " | ".join(str(c) for c in counts) + " |\n")
+        f.write(f"| **合計** | | {sum(len(run['history']) - 1 for run in runs)} | "
+                + " | ".join(str(totals[key]) for key in categories) + " |\n")
+    return filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moltbook 論壇模擬（多個討論串同時進行）")
+    parser.add_argument("--threads", type=int, default=len(FORUM_POSTS), help="討論串數")
+    parser.add_argument("--version", default="v3", choices=sorted(VERSIONS), help="實驗範式")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時在途的 API 請求上限")
+    parser.add_argument("--rounds", type=int, default=None, help="每串接龍輪數（預設沿用範式 ROUNDS）")
+    parser.add_argument("--seed", type=int, default=None, help="基準亂數種子（第 t 串使用 seed + t）")
+    parser.add_argument("--agents", type=int, default=None, help="agent 數（預設每個模型一個，多於模型數時共用後端模型）")
+    parser.add_argument("--no-reports", action="store_true", help="不輸出每串的 markdown 紀錄")
+    parser.add_argument("--resume", metavar="FORUM_ID", help="接續中斷的論壇（--threads / --version 需與原本相同）")
+    add_mock_argument(parser)
+    args = parser.parse_args()
+    apply_mock_argument(args)
+
+    strategy = get_strategy(args.version)
+    forum_id = args.resume or datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    print("=" * 70)
+    print("🏛️ Moltbook 論壇模擬")
+    print("=" * 70)
+    print(f"📅 論壇編號: {forum_id}")
+    print(f"🧵 討論串數: {args.threads}")
+    print(f"🔬 範式: {args.version}")
+    print(f"🚦 併發上限: {args.concurrency}")
+    print(f"🔄 每串輪數: {args.rounds or strategy.rounds}")
+    if args.resume:
+        print(f"♻️ 接續論壇: {args.resume}")
+    print("=" * 70)
+    print_dropped(strategy.dropped_models)
+
+    runs = new_forum(
+        args.version, args.threads, args.seed, forum_id, args.rounds, resume=bool(args.resume), agents=args.agents,
+    )
+    population = runs[0]["population"]
+    print(f"👥 Agent 數: {len(population)}（{len(population.models)} 個模型，{population.nbytes / 1024:.1f} KB）")
+    if "virus_models" in runs[0]:
+        names = sorted(runs[0]["virus_models"])
+        shown = ", ".join(name.split("/")[-1] for name in names[:10])
+        print(f"🦠 異見者（所有討論串共用）: {len(names)} 個 - {shown}{' …' if len(names) > 10 else ''}")
+
+    def on_done(run):
+        extra = run["strategy"].summary_text(run)
+        print(f"✅ {run['experiment_id']}: {len(run['history']) - 1}/{run['rounds']} 輪"
+              f"{', ' + extra if extra else ''}")
+
+    client = make_async_client(args.concurrency)
+    started = time.perf_counter()
+    stats = asyncio.run(run_forum(runs, client, args.concurrency, on_done=on_done))
+    elapsed = time.perf_counter() - started
+
+    if not args.no_reports:
+        for run in runs:
+            run["strategy"].write_reports(run)
+    overview = write_overview(runs, forum_id)
+
+    total_failures = sum(len(run["statistics"]["model_failures"]) for run in runs)
+    print("\n" + "=" * 70)
+    print("📊 論壇統計:")
+    print(f"   🔄 本次執行輪數: {stats['rounds']}")
+    print(f"   ❌ API 失敗: {total_failures} 次")
+    print(f"   ⏱️ 總耗時: {elapsed:.1f} 秒")
+    print(f"   🚀 吞吐量: {stats['rounds'] / elapsed if elapsed else 0:.2f} 輪/秒")
+    print(f"   🛫 平均在途請求: {stats['busy'] / elapsed if elapsed else 0:.1f}（上限 {args.concurrency}）")
+    print(f"   📄 論壇總覽: {overview}")
+    print_cache_stats(client)
+    print_connection_stats()
+    save_calibration()
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+===============================================================================
+Moltbook 回覆圖 - 逐則增量維護的回覆 / @ 關係與異見者擴散（cascade）查詢
+===============================================================================
+
+為什麼需要：
+- 「誰回應誰」原本只存在於兩個地方：30% 機率的 @ 抽籤（抽完就丟）與
+  virus_detected 的「上一則是不是異見者」判斷，沒有任何資料留給分析
+- 想知道異見者的一則留言，在 k 跳之內傳到了多少正常模型、傳多深、多寬
+
+設計：
+- 節點為 history 索引（0 = 原始貼文），邊由被回應的留言指向回應它的留言：
+    回覆邊  寫這則留言時看到的最後一則（依序接龍為前一則；離散事件模式為 entry["seen"]）
+    @ 邊    build_messages 抽中的 @ 對象（記錄在 entry["mention"]）
+- 每則留言寫入時 O(1) 更新（引擎的 append_post），不需要從頭重建：
+    reply_to / mention  array("i")    回覆邊 / @ 邊的來源（-1 = 無）
+    dissenter           bytearray     是否為異見者留言
+    depth               array("H")    與最近的上游異見者留言相距幾跳（0 = 本身是異見者）
+    exposure[d]                       depth == d 的正常留言數 → exposed(k) 為 O(k)
+- cascade(來源, k) 以 BFS 沿子節點展開 k 跳，成本只與擴散範圍成正比
+- 事件紀錄讀回（load_run）時逐則重播建出同一張圖；分岔的分支以 copy() 複製前綴
+"""
+
+from array import array
+
+DEFAULT_HOPS = 3
+UNREACHED = 0xFFFF
+
+
+class ReplyGraph:
+    """單場實驗的回覆 / @ 圖"""
+
+    def __init__(self):
+        self.reply_to = array("i", [-1])
+        self.mention = array("i", [-1])
+        self.dissenter = bytearray(1)
+        self.depth = array("H", [UNREACHED])
+        self.exposure = []
+        self._children = [[]]
+
+    def __len__(self):
+        return len(self.reply_to)
+
+    def copy(self):
+        graph = ReplyGraph()
+        graph.reply_to = array("i", self.reply_to)
+        graph.mention = array("i", self.mention)
+        graph.dissenter = bytearray(self.dissenter)
+        graph.depth = array("H", self.depth)
+        graph.exposure = list(self.exposure)
+        graph._children = [list(children) for children in self._children]
+        return graph
+
+    def add(self, entry):
+        """加入下一則留言（history 中的下一個索引），回傳節點編號"""
+        node = len(self)
+        parent = entry.get("seen", node - 1)
+        mention = entry.get("mention", -1)
+        is_virus = bool(entry.get("is_virus", False))
+
+        self.reply_to.append(parent)
+        self.mention.append(mention)
+        self.dissenter.append(is_virus)
+        self._children.append([])
+        self._children[parent].append(node)
+        parents = (parent,)
+        if mention >= 0 and mention != parent:
+            self._children[mention].append(node)
+            parents = (parent, mention)
+
+        if is_virus:
+            depth = 0
+        else:
+            upstream = min(self.depth[p] for p in parents)
+            depth = UNREACHED if upstream >= UNREACHED - 1 else upstream + 1
+            if depth != UNREACHED:
+                while len(self.exposure) <= depth:
+                    self.exposure.append(0)
+                self.exposure[depth] += 1
+        self.depth.append(depth)
+        return node
+
+    # ---------- 查詢 ----------
+    def parents(self, node):
+        return [p for p in (self.reply_to[node], self.mention[node]) if p >= 0]
+
+    def children(self, node):
+        return self._children[node]
+
+    def replied_to_dissenter(self, node):
+        """這則留言回應的（回覆邊）是不是異見者留言"""
+        parent = self.reply_to[node]
+        return parent >= 0 and bool(self.dissenter[parent])
+
+    def dissenter_posts(self):
+        return [node for node in range(1, len(self)) if self.dissenter[node]]
+
+    def downstream(self, source, hops=DEFAULT_HOPS):
+        """source 下游 1~hops 跳的節點，依跳數分層回傳 [[第 1 跳], [第 2 跳], ...]"""
+        seen = {source}
+        levels = []
+        frontier = [source]
+        for _ in range(hops):
+            level = []
+            for node in frontier:
+                for child in self._children[node]:
+                    if child not in seen:
+                        seen.add(child)
+                        level.append(child)
+            if not level:
+                break
+            levels.append(level)
+            frontier = level
+        return levels
+
+    def cascade(self, source, hops=DEFAULT_HOPS):
+        """
+        單一異見者留言的擴散：hops 跳內的正常留言（posts）、
+        depth = 有正常留言的最深跳數、breadth = 單一跳數內最多的正常留言數
+        """
+        posts = []
+        depth = 0
+        breadth = 0
+        for hop, level in enumerate(self.downstream(source, hops), start=1):
+            normal = [node for node in level if not self.dissenter[node]]
+            if normal:
+                posts.extend(normal)
+                depth = hop
+                breadth = max(breadth, len(normal))
+        return {"source": source, "size": len(posts), "depth": depth, "breadth": breadth, "posts": posts}
+
+    def cascades(self, hops=DEFAULT_HOPS):
+        return [self.cascade(source, hops) for source in self.dissenter_posts()]
+
+    def exposed(self, hops=DEFAULT_HOPS):
+        """hops 跳內位於任一異見者留言下游的正常留言數（增量維護，O(hops)）"""
+        return sum(self.exposure[1:hops + 1])
@@ -0,0 +1,154 @@
+"""
+===============================================================================
+Moltbook 模型可用性檔案 - test_models.py 的探測結果（含 TTL）
+===============================================================================
+
+test_models.py 探測每個模型後寫入 moltbook_model_profile.json：
+    {
+      "created": 1760000000.0,
+      "ttl_hours": 6,
+      "models": {
+        "openai/gpt-4o": {"status": "ok", "ttft_p50": 0.41, "latency_p90": 1.9, "tps_p50": 72.0, ...},
+        "microsoft/wizardlm-2-8x22b": {"status": "dead", "errors": {"404": 3}, ...}
+      }
+    }
+
+實驗腳本在 import 時呼叫 apply_profile(ALL_MODELS)：
+- 檔案存在且未過期 → 移除 status 為 dead / slow 的模型
+- 檔案中沒有的模型一律保留（沒測過不代表不能用）
+- 過期、不存在或 MOLTBOOK_PROFILE=0 → 不過濾
+
+設定：
+    MOLTBOOK_PROFILE=0                  # 停用過濾
+    MOLTBOOK_PROFILE_PATH=...           # 檔案位置
+    MOLTBOOK_PROFILE_TTL=6              # 有效時數
+"""
+
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+PROFILE_PATH = "moltbook_model_profile.json"
+DEFAULT_TTL_HOURS = 6
+DROP_STATUSES = ("dead", "slow")
+
+# 判定「太慢」的門檻（秒）：中位數延遲或首 token 延遲超過即標記為 slow
+SLOW_LATENCY_P50 = 30.0
+SLOW_TTFT_P50 = 15.0
+
+
+def percentile(values, q):
+    """最近秩百分位數；空清單回傳 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+
+def classify(samples):
+    """
+    samples: [{"ok": bool, "status": int|None, "ttft": s, "latency": s, "tps": float}, ...]
+    回傳 (status, 統計 dict)
+    """
+    ok = [s for s in samples if s["ok"]]
+    errors = {}
+    for s in samples:
+        if not s["ok"]:
+            key = str(s["status"] or "error")
+            errors[key] = errors.get(key, 0) + 1
+
+    ttfts = [s["ttft"] for s in ok if s["ttft"] is not None]
+    latencies = [s["latency"] for s in ok]
+    tps = [s["tps"] for s in ok if s["tps"]]
+    summary = {
+        "samples": len(samples),
+        "ok": len(ok),
+        "errors": errors,
+        "ttft_p50": percentile(ttfts, 0.5),
+        "ttft_p90": percentile(ttfts, 0.9),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p90": percentile(latencies, 0.9),
+        "tps_p50": percentile(tps, 0.5),
+        "tps_p90": percentile(tps, 0.9),
+    }
+
+    if "404" in errors or (not ok and set(errors) != {"429"}):
+        status = "dead"
+    elif not ok:
+        status = "rate_limited"   # 全部 429：暫時性，不剔除
+    elif summary["latency_p50"] > SLOW_LATENCY_P50 or (summary["ttft_p50"] or 0) > SLOW_TTFT_P50:
+        status = "slow"
+    else:
+        status = "ok"
+    summary["status"] = status
+    return status, summary
+
+
+def profile_path():
+    return os.getenv("MOLTBOOK_PROFILE_PATH", PROFILE_PATH)
+
+
+def save_profile(models, ttl_hours=DEFAULT_TTL_HOURS, path=None):
+    """原子寫入探測結果；models 為 {model: summary}"""
+    path = path or profile_path()
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": time.time(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "ttl_hours": ttl_hours,
+            "models": models,
+        }, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_profile(path=None, ttl_hours=None):
+    """讀取未過期的探測結果；不存在、損毀或過期時回傳 None"""
+    path = path or profile_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if ttl_hours is None:
+        ttl_hours = float(os.getenv("MOLTBOOK_PROFILE_TTL", profile.get("ttl_hours", DEFAULT_TTL_HOURS)))
+    if time.time() - profile.get("created", 0) > ttl_hours * 3600:
+        return None
+    return profile
+
+
+def apply_profile(models, profile=None):
+    """
+    回傳 (保留的模型, [(剔除的模型, 原因), ...])
+    全部都會被剔除時不過濾（寧可在實驗中失敗，也不要跑空的模型池）
+    """
+    if os.getenv("MOLTBOOK_PROFILE", "1") == "0":
+        return list(models), []
+    profile = profile or load_profile()
+    if profile is None:
+        return list(models), []
+    entries = profile.get("models", {})
+    kept, dropped = [], []
+    for model in models:
+        status = entries.get(model, {}).get("status")
+        if status in DROP_STATUSES:
+            dropped.append((model, status))
+        else:
+            kept.append(model)
+    if not kept:
+        return list(models), []
+    return kept, dropped
+
+
+def print_dropped(dropped):
+    if not dropped:
+        return
+    print(f"🩺 依模型探測結果（{profile_path()}）排除 {len(dropped)} 個模型:")
+    for model, status in dropped:
+        print(f"   - {model} ({status})")
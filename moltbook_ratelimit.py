@@ -0,0 +1,226 @@
+"""
+===============================================================================
+Moltbook 限流與重試 - Token Bucket + 抖動指數退避
+===============================================================================
+
+取代每輪固定的 time.sleep(1)：
+- 供應商有餘裕時不必白等，額度吃緊時也不會一直撞 429
+- 每個上游供應商（openai / anthropic / meta-llama ...）與每個模型各一個 token bucket
+- 429 / 5xx / 連線錯誤 → 指數退避 + full jitter，有 Retry-After 時以它為準
+- 429 會把該供應商的 bucket 往後推，讓同供應商的其他請求一起讓路
+- 重試次數另外記錄，用盡重試仍失敗才算真正的 model_failures
+
+設定（.env 或環境變數）：
+    MOLTBOOK_RATE_PROVIDER=5      # 每個供應商每秒請求數
+    MOLTBOOK_BURST_PROVIDER=5     # 供應商 bucket 容量
+    MOLTBOOK_RATE_MODEL=2         # 每個模型每秒請求數
+    MOLTBOOK_BURST_MODEL=2        # 模型 bucket 容量
+    MOLTBOOK_MAX_RETRIES=5
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from openai import APIConnectionError, APIStatusError
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    以「預約」方式取 token：餘額可為負數，回傳需要等待的秒數
+    同步與非同步呼叫端都只需要 sleep 這段時間，不必輪詢
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds):
+        """接下來 seconds 秒內不發放 token（用於 429 Retry-After）"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class RateLimiter:
+    """每個供應商、每個模型各一個 bucket；rate <= 0 代表不限"""
+
+    def __init__(self, provider_rate=5.0, provider_burst=5, model_rate=2.0, model_burst=2):
+        self.provider_rate = provider_rate
+        self.provider_burst = provider_burst
+        self.model_rate = model_rate
+        self.model_burst = model_burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def provider_of(model):
+        return model.split("/")[0]
+
+    def _bucket(self, key, rate, burst):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, burst)
+            return bucket
+
+    def _buckets_for(self, model):
+        buckets = []
+        if self.provider_rate > 0:
+            buckets.append(self._bucket(("provider", self.provider_of(model)), self.provider_rate, self.provider_burst))
+        if self.model_rate > 0:
+            buckets.append(self._bucket(("model", model), self.model_rate, self.model_burst))
+        return buckets
+
+    def reserve(self, model):
+        return max([bucket.reserve() for bucket in self._buckets_for(model)], default=0.0)
+
+    def acquire(self, model):
+        wait = self.reserve(model)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, model):
+        wait = self.reserve(model)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, model, seconds):
+        """429：整個供應商暫停 seconds 秒"""
+        if self.provider_rate > 0:
+            self._bucket(("provider", self.provider_of(model)), self.provider_rate, self.provider_burst).pause(seconds)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            float(os.getenv("MOLTBOOK_RATE_PROVIDER", 5)),
+            float(os.getenv("MOLTBOOK_BURST_PROVIDER", 5)),
+            float(os.getenv("MOLTBOOK_RATE_MODEL", 2)),
+            float(os.getenv("MOLTBOOK_BURST_MODEL", 2)),
+        )
+
+
+class RetryPolicy:
+    """指數退避 + full jitter；抖動使用獨立 rng，不影響實驗本身的亂數序列"""
+
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = random.Random()
+
+    def delay(self, attempt, exc):
+        retry_after = retry_after_seconds(exc)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @classmethod
+    def from_env(cls):
+        return cls(int(os.getenv("MOLTBOOK_MAX_RETRIES", 5)))
+
+
+def status_of(exc):
+    return getattr(exc, "status_code", None)
+
+
+def is_retryable(exc):
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS
+    # APITimeoutError 是 APIConnectionError 的子類別
+    return isinstance(exc, APIConnectionError)
+
+
+def retry_after_seconds(exc):
+    """解析 Retry-After / retry-after-ms（秒數或 HTTP 日期），沒有則回傳 None"""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(fn, model, limiter, policy, on_retry=None):
+    """
+    同步版本：限流 → 呼叫 → 可重試的錯誤就退避後再試
+    on_retry(status, delay) 在每次重試前被呼叫（用來記錄 api_retries）
+    """
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire(model)
+        try:
+            return fn()
+        except Exception as e:
+            if not is_retryable(e) or attempt >= policy.max_retries:
+                raise
+            delay = policy.delay(attempt, e)
+            if status_of(e) == 429 and limiter:
+                limiter.penalize(model, delay)
+            if on_retry:
+                on_retry(status_of(e), delay)
+            time.sleep(delay)
+            attempt += 1
+
+
+async def call_with_retry_async(fn, model, limiter, policy, on_retry=None):
+    """call_with_retry 的非同步版本（fn 回傳 coroutine）"""
+    attempt = 0
+    while True:
+        if limiter:
+            await limiter.acquire_async(model)
+        try:
+            return await fn()
+        except Exception as e:
+            if not is_retryable(e) or attempt >= policy.max_retries:
+                raise
+            delay = policy.delay(attempt, e)
+            if status_of(e) == 429 and limiter:
+                limiter.penalize(model, delay)
+            if on_retry:
+                on_retry(status_of(e), delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def retry_recorder(statistics, round_num, model, verbose=True):
+    """建立 on_retry 回呼：重試記到 statistics["api_retries"]，與 model_failures 分開"""
+    def on_retry(status, delay):
+        statistics["api_retries"].append((round_num, model, status, round(delay, 2)))
+        if verbose:
+            print(f"   ⏳ {status or '連線錯誤'}，{delay:.1f} 秒後重試")
+    return on_retry
@@ -0,0 +1,283 @@
+"""
+===============================================================================
+Moltbook 離線重新分析 - 以目前的偵測器重新計分既有實驗（不呼叫 API）
+===============================================================================
+
+為什麼需要：
+- 調整 moltbook_detectors 的關鍵字表後，唯一看到效果的方法是再付費跑一場新實驗
+- 既有實驗的留言都還在（事件紀錄 / 歷史紀錄庫 / markdown 對話紀錄），只是偵測結果過時
+
+設計：
+- 來源：
+    moltbook_events_*.jsonl   事件紀錄（含分支），statistics 與舊偵測結果可直接比對
+    moltbook_archive.npz      moltbook_archive 建立的歷史紀錄庫，每場實驗一個工作
+    moltbook_chaos_log_*.md   直接串流解析 markdown 對話紀錄
+- 每場依原本的順序逐則寫入 history 並呼叫 Strategy.detect（與實驗中完全相同的偵測流程，
+  v3 的「異見者被發現」等依賴上一則留言的規則也一併重算），重建完整的 statistics
+- model_failures / api_retries 不是偵測結果，直接沿用事件紀錄中的資料
+- 工作切塊後送進 ProcessPoolExecutor，紀錄庫在每個 worker 只載入一次
+- 迴歸檢查：--save-baseline 存下每場的計分，修改關鍵字後 --compare 列出差異（有差異時 exit 1）
+
+用法：
+    python moltbook_reanalyze.py                                   # 目前目錄所有事件紀錄 + 紀錄庫
+    python moltbook_reanalyze.py moltbook_archive.npz --reports    # 重新輸出分析報告（*_rescored.md）
+    python moltbook_reanalyze.py --save-baseline detectors_baseline.json
+    python moltbook_reanalyze.py --compare detectors_baseline.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from moltbook_agents import Population
+from moltbook_core import get_strategy, load_run
+from moltbook_eventlog import History
+from moltbook_graph import ReplyGraph
+
+EVENT_GLOB = "moltbook_events_*.jsonl"
+ARCHIVE_PATH = "moltbook_archive.npz"
+CARRIED = ("model_failures", "api_retries")
+
+_ARCHIVES = {}
+
+
+def rescore(version, entries, experiment_id, rounds=None, seed=None, virus_models=(), carried=None,
+            initial_post=None, population=None):
+    """
+    以目前的偵測器重新掃描一場實驗的留言，回傳新的 run（history / statistics 都在記憶體）
+    entries：依序的留言（不含原始貼文），carried：直接沿用的非偵測統計
+    initial_post：原始貼文（論壇討論串各自不同，預設沿用範式的 initial_post）
+    population：事件檔記錄的族群（只影響報告，偵測直接使用留言中的 is_virus）；
+    markdown / 紀錄庫來源沒有記錄模型池，以目前的模型池補上異見者模型重建
+    """
+    strategy = get_strategy(version)
+    if population is None:
+        models = list(strategy.all_models)
+        models += sorted(set(virus_models) - set(models))
+        population = Population(strategy, models=models)
+    run = {
+        "experiment_id": experiment_id,
+        "version": version,
+        "strategy": strategy,
+        "seed": seed,
+        "rounds": rounds or strategy.rounds,
+        "rng": None,
+        "population": population,
+        "history": History(strategy.initial_entry(initial_post), strategy.max_context),
+        "graph": ReplyGraph(),
+        "statistics": strategy.new_statistics(),
+        "event_log": None,
+        "finished": True,
+    }
+    strategy.restore(run, {"virus_models": list(virus_models)})
+    for key, items in (carried or {}).items():
+        run["statistics"][key] = list(items)
+    for entry in entries:
+        run["history"].append(entry)
+        run["graph"].add(entry)
+        strategy.detect(run, entry, verbose=False)
+    run["next_round"] = (run["history"][-1]["round"] if len(run["history"]) > 1 else 0) + 1
+    return run
+
+
+# ========== 來源 ==========
+def _from_event_log(path):
+    stored = load_run(path)
+    carried = {key: list(stored["statistics"][key]) for key in CARRIED if key in stored["statistics"]}
+    run = rescore(
+        stored["version"], stored["history"].posts(), stored["experiment_id"], stored["rounds"],
+        stored["seed"], stored.get("virus_models", ()), carried, stored["history"][0]["content"],
+        stored["population"],
+    )
+    return run, {key: len(items) for key, items in stored["statistics"].items()}
+
+
+def _load_archive(path):
+    from moltbook_archive import Archive
+
+    if path not in _ARCHIVES:
+        _ARCHIVES[path] = Archive.load(path)
+    return _ARCHIVES[path]
+
+
+def _from_archive(path, index):
+    archive = _load_archive(path)
+    # 留言依實驗依序寫入，post_run 為非遞減，二分搜尋即可取得該場的範圍
+    start, end = archive.post_run.searchsorted([index, index + 1])
+    categories = archive.categories
+    entries = (
+        {
+            "round": int(archive.post_round[i]),
+            "model": str(archive.models[archive.post_model[i]]),
+            "content": archive.content(i),
+            "category": str(categories[archive.post_category[i]]),
+            "is_virus": bool(archive.post_virus[i]),
+        }
+        for i in range(start, end)
+    )
+    rounds = int(archive.run_rounds[index])
+    run = rescore(
+        str(archive.run_version[index]), entries, str(archive.run_experiment_id[index]),
+        rounds if rounds > 0 else None, virus_models=archive.virus_models(index),
+    )
+    return run, None
+
+
+def _from_markdown(path):
+    from moltbook_archive import describe_file, iter_log
+
+    version, experiment_id = describe_file(path)
+    with open(path, encoding="utf-8") as f:
+        records = iter_log(f)
+        meta = next((item for kind, item in records if kind == "meta"), {"virus_models": []})
+        run = rescore(
+            version, (item for _, item in records), meta.get("實驗編號", experiment_id),
+            virus_models=meta["virus_models"],
+        )
+    return run, None
+
+
+def rescore_job(job, write_reports=False):
+    """job = (類型, 路徑, 紀錄庫中的 run 索引)；回傳可跨程序傳遞的摘要"""
+    kind, path, index = job
+    if kind == "events":
+        run, stored = _from_event_log(path)
+        source = path
+    elif kind == "archive":
+        run, stored = _from_archive(path, index)
+        source = f"{path}#{run['version']}/{run['experiment_id']}"
+    else:
+        run, stored = _from_markdown(path)
+        source = path
+
+    summary = {
+        "source": source,
+        "experiment_id": run["experiment_id"],
+        "version": run["version"],
+        "posts": len(run["history"]) - 1,
+        "stored": stored,
+        "rescored": {key: len(items) for key, items in run["statistics"].items()},
+        "reports": None,
+    }
+    if write_reports:
+        run["experiment_id"] = f"{run['experiment_id']}_rescored"
+        summary["reports"] = run["strategy"].write_reports(run)
+    return summary
+
+
+def rescore_chunk(jobs, write_reports=False):
+    """在 worker 程序內處理一塊工作（必須是模組層級函式才能被 pickle）"""
+    return [rescore_job(job, write_reports) for job in jobs]
+
+
+def collect_jobs(paths):
+    jobs = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            jobs.append(("events", path, None))
+        elif path.endswith(".npz"):
+            archive = _load_archive(path)
+            jobs.extend(("archive", path, i) for i in range(len(archive.run_experiment_id)))
+        elif path.endswith(".md"):
+            jobs.append(("markdown", path, None))
+        else:
+            raise ValueError(f"無法辨識的來源: {path}")
+    return jobs
+
+
+def rescore_all(jobs, workers=None, write_reports=False):
+    """把工作切塊送進程序池，回傳依來源排序的摘要清單"""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        summaries = rescore_chunk(jobs, write_reports)
+    else:
+        size = max(1, len(jobs) // (workers * 4))
+        chunks = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            summaries = [s for chunk in pool.map(rescore_chunk, chunks, [write_reports] * len(chunks)) for s in chunk]
+    return sorted(summaries, key=lambda s: s["source"])
+
+
+def compare(summaries, baseline):
+    """與 baseline（{來源: 計分}）比對，回傳 [(來源, 類別, 舊值, 新值), ...]"""
+    diffs = []
+    for s in summaries:
+        old = baseline.get(s["source"])
+        if old is None:
+            continue
+        for key in sorted(set(old) | set(s["rescored"])):
+            if old.get(key, 0) != s["rescored"].get(key, 0):
+                diffs.append((s["source"], key, old.get(key, 0), s["rescored"].get(key, 0)))
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moltbook 離線重新分析（以目前的偵測器重新計分）")
+    parser.add_argument("paths", nargs="*", help=f"事件紀錄 / 紀錄庫 / markdown 紀錄（預設 {EVENT_GLOB} 與 {ARCHIVE_PATH}）")
+    parser.add_argument("--workers", type=int, default=None, help="程序池大小（預設 = CPU 核心數）")
+    parser.add_argument("--reports", action="store_true", help="重新輸出對話紀錄與分析報告（實驗編號加上 _rescored）")
+    parser.add_argument("--save-baseline", metavar="JSON", help="存下每場的計分，供之後 --compare")
+    parser.add_argument("--compare", metavar="JSON", help="與先前存下的計分比對，有差異時 exit 1")
+    args = parser.parse_args()
+
+    paths = []
+    for pattern in args.paths or [EVENT_GLOB, ARCHIVE_PATH]:
+        paths.extend(sorted(glob.glob(pattern)))
+    jobs = collect_jobs(paths)
+    if not jobs:
+        parser.error("找不到任何可重新分析的實驗")
+
+    print("=" * 70)
+    print("🔁 Moltbook 離線重新分析")
+    print("=" * 70)
+    print(f"📂 來源: {len(paths)} 個檔案 / {len(jobs)} 場實驗")
+
+    started = time.perf_counter()
+    summaries = rescore_all(jobs, args.workers, args.reports)
+    elapsed = time.perf_counter() - started
+    print(f"⏱️ {elapsed:.2f} 秒（{len(summaries) / elapsed if elapsed else 0:.0f} 場/秒）")
+
+    for version in sorted({s["version"] for s in summaries}):
+        group = [s for s in summaries if s["version"] == version]
+        rescored = Counter()
+        stored = Counter()
+        with_stored = [s for s in group if s["stored"] is not None]
+        for s in group:
+            rescored.update(s["rescored"])
+        for s in with_stored:
+            stored.update(s["stored"])
+        print(f"\n🧪 {version}（{len(group)} 場，{sum(s['posts'] for s in group)} 則留言）")
+        for key in sorted(rescored):
+            line = f"   {key}: {rescored[key]}"
+            if with_stored:
+                delta = sum(s["rescored"].get(key, 0) for s in with_stored) - stored[key]
+                line += f"（事件紀錄中原為 {stored[key]}，{delta:+d}）" if delta else "（與事件紀錄相同）"
+            print(line)
+
+    if args.reports:
+        print(f"\n📄 已輸出 {len(summaries)} 組 *_rescored 報告")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({s["source"]: s["rescored"] for s in summaries}, f, ensure_ascii=False, indent=2)
+        print(f"\n🗂️ 計分已保存: {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            diffs = compare(summaries, json.load(f))
+        if not diffs:
+            print(f"\n✅ 與 {args.compare} 完全相同")
+            return
+        print(f"\n⚠️ 與 {args.compare} 有 {len(diffs)} 處差異:")
+        for source, key, old, new in diffs[:50]:
+            print(f"   {source} {key}: {old} → {new}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
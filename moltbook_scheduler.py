@@ -0,0 +1,293 @@
+"""
+===============================================================================
+Moltbook 離散事件模式 - 多則留言同時在途，依完成順序寫入討論串
+===============================================================================
+
+為什麼需要：
+- 原本的接龍嚴格「發一則、等回應、再發下一則」，不像真實論壇，
+  --concurrency 的併發額度在單一討論串裡完全用不到
+- 真實論壇裡多個使用者會同時讀到同一個畫面、各自回覆，回覆彼此「賽跑」
+
+設計：
+- 到達排程：Poisson（--rate 每秒平均到達數，間隔為指數分佈）或軌跡檔（--trace，
+  JSONL 每行 {"t": 秒, "agent": 名稱}，agent 可省略）
+- 送出時（到達時刻，在途數達 --max-in-flight 時延後到有空位）才抽 agent、組上下文，
+  上下文是「當下看得到的」留言快照；請求送出後不阻塞，下一個到達照常送出
+- 回應依完成順序寫入 history：entry["round"] 為完成順序，另記錄
+    request  第幾個請求（到達順序，model_failures / api_retries 也以此編號）
+    sent_at / posted_at  送出 / 寫入時刻（秒，從實驗開始起算）
+    seen     送出時看得到幾則留言（seen < round - 1 代表與其他回覆賽跑、沒看到彼此）
+- 時鐘：
+    sim   模擬時鐘：請求照常送出（可平行），但完成時刻 = 送出時刻 + 模擬延遲
+          （moltbook_profile 的實測 latency_p50，否則預設中位數 DEFAULT_LATENCY），
+          依模擬時間排序寫入；同 seed + 固定回應的 client（例如 --mock）結果完全可重現，適合測試
+    real  真實時鐘：依實際時間送出，誰先回來誰先寫入（正式實驗）
+- 事件紀錄多一個 schedule 事件；中途沒有 checkpoint（中斷時可能有請求在途），
+  未完成的實驗無法 --resume，但可照常用 moltbook_eventlog 重新輸出報告
+
+用法：
+    python moltbook_scheduler.py --rounds 50 --rate 1 --max-in-flight 8 --mock
+    python moltbook_scheduler.py --clock sim --seed 42 --rounds 200 --rate 2 --mock
+    python moltbook_scheduler.py --trace arrivals.jsonl --version v2
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import math
+import random
+import time
+from dotenv import load_dotenv
+
+from moltbook_api import request_reply_async, save_calibration
+from moltbook_async_engine import make_async_client
+from moltbook_cache import print_cache_stats
+from moltbook_core import (
+    VERSIONS, finish_run, get_strategy, new_run, plan_round, record_failure, record_reply,
+)
+from moltbook_profile import load_profile, print_dropped
+from moltbook_ratelimit import retry_recorder
+from moltbook_transport import add_mock_argument, apply_mock_argument, print_connection_stats
+
+load_dotenv()
+
+DEFAULT_RATE = 1.0           # 每秒平均到達數
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_LATENCY = 2.0        # 模擬時鐘沒有實測資料時的延遲中位數（秒）
+LATENCY_SIGMA = 0.5          # 模擬延遲的 lognormal sigma
+
+
+# ========== 到達排程 ==========
+def poisson_arrivals(rng, rate, count):
+    """Poisson 到達：產生 count 個 (時刻, None)，間隔 ~ Exp(rate)"""
+    t = 0.0
+    for _ in range(count):
+        t += rng.expovariate(rate)
+        yield t, None
+
+
+def load_trace(path):
+    """讀取軌跡檔（JSONL，每行 {"t": 秒, "agent": 名稱}），依時刻排序回傳 [(時刻, agent 名稱或 None), ...]"""
+    arrivals = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                arrivals.append((float(record["t"]), record.get("agent")))
+    arrivals.sort(key=lambda item: item[0])
+    return arrivals
+
+
+def simulated_latency(model, rng, profile=None):
+    """
+    模擬時鐘的請求延遲：以實測 latency_p50（沒有時 DEFAULT_LATENCY）為中位數的 lognormal
+    profile 為 moltbook_profile 探測結果的 models 欄位
+    """
+    median = ((profile or {}).get(model) or {}).get("latency_p50") or DEFAULT_LATENCY
+    return rng.lognormvariate(math.log(median), LATENCY_SIGMA)
+
+
+# ========== 排程器 ==========
+class _Request:
+    __slots__ = ("number", "agent", "model", "sent_at", "seen", "mention", "prompt_tokens", "task")
+
+
+def _send(run, client, number, now, agent, verbose):
+    """以當下的 history 快照組上下文並送出請求（不等待回應）"""
+    history = run["history"]
+    request = _Request()
+    request.number = number
+    request.agent, messages, seed, request.mention, request.prompt_tokens = plan_round(run, agent)
+    request.model = run["population"].model(request.agent)
+    request.sent_at = now
+    request.seen = len(history) - 1
+    request.task = asyncio.ensure_future(request_reply_async(
+        client, request.model, messages, run["strategy"].temperature, seed=seed,
+        on_retry=retry_recorder(run["statistics"], number, request.model, verbose),
+    ))
+    if verbose:
+        print(f"📤 t={now:7.2f}s 請求 #{number} @{run['population'].name(request.agent).split('/')[-1]}"
+              f"（可見 {request.seen} 則，prompt ~{request.prompt_tokens} tokens）")
+    return request
+
+
+async def _complete(run, request, now, verbose):
+    """把請求的結果寫入 history（round = 完成順序）"""
+    try:
+        raw_content = await request.task
+    except Exception as e:
+        record_failure(run, request.number, request.model, e, verbose)
+        return
+    round_num = len(run["history"])
+    if verbose:
+        print(f"📥 t={now:7.2f}s 請求 #{request.number} → 第 {round_num} 則")
+    record_reply(run, round_num, request.agent, raw_content, verbose, extra={
+        "request": request.number,
+        "sent_at": round(request.sent_at, 3),
+        "posted_at": round(now, 3),
+        "seen": request.seen,
+    }, mention=request.mention, prompt_tokens=request.prompt_tokens)
+
+
+async def run_events(run, client, arrivals, clock="sim", max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                     latency_rng=None, profile=None, verbose=False):
+    """
+    以離散事件方式執行一場實驗：arrivals 為依時刻排序的 (時刻, agent 名稱或 None)
+    clock="sim" 依模擬延遲排序完成事件；clock="real" 依實際時間送出與寫入
+    回傳 {"makespan": 實驗時長, "busy": 所有請求延遲總和, "max_in_flight": 觀察到的最大在途數}（秒）
+    """
+    population = run["population"]
+    arrivals = iter(arrivals)
+    latency_rng = latency_rng or random.Random()
+    stats = {"makespan": 0.0, "busy": 0.0, "max_in_flight": 0}
+    number = 0
+
+    def next_arrival():
+        item = next(arrivals, None)
+        if item is None or number >= run["rounds"]:
+            return None
+        t, name = item
+        agent = None
+        if name is not None:
+            agent = population.agent_id(name)
+            if agent is None:
+                raise ValueError(f"軌跡檔中的 agent 不在族群中: {name}")
+        return t, agent
+
+    if run.get("event_log"):
+        run["event_log"].emit("schedule", schedule={"clock": clock, "max_in_flight": max_in_flight})
+
+    completed = False
+    try:
+        arrival = next_arrival()
+        if clock == "sim":
+            now = 0.0
+            in_flight = []   # (完成時刻, 請求編號, 請求)
+            while arrival or in_flight:
+                can_send = arrival is not None and len(in_flight) < max_in_flight
+                if can_send and (not in_flight or max(now, arrival[0]) <= in_flight[0][0]):
+                    now = max(now, arrival[0])
+                    number += 1
+                    request = _send(run, client, number, now, arrival[1], verbose)
+                    delay = simulated_latency(request.model, latency_rng, profile)
+                    heapq.heappush(in_flight, (now + delay, number, request))
+                    stats["busy"] += delay
+                    stats["max_in_flight"] = max(stats["max_in_flight"], len(in_flight))
+                    arrival = next_arrival()
+                else:
+                    now, _, request = heapq.heappop(in_flight)
+                    await _complete(run, request, now, verbose)
+            stats["makespan"] = now
+        else:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            pending = {}
+            while arrival or pending:
+                timeout = None
+                if arrival is not None and len(pending) < max_in_flight:
+                    timeout = max(0.0, started + arrival[0] - loop.time())
+                if pending:
+                    done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    await asyncio.sleep(timeout)
+                    done = ()
+                now = loop.time() - started
+                for task in sorted(done, key=lambda task: pending[task].number):
+                    request = pending.pop(task)
+                    stats["busy"] += now - request.sent_at
+                    await _complete(run, request, now, verbose)
+                if arrival is not None and len(pending) < max_in_flight and now >= arrival[0]:
+                    number += 1
+                    request = _send(run, client, number, now, arrival[1], verbose)
+                    pending[request.task] = request
+                    stats["max_in_flight"] = max(stats["max_in_flight"], len(pending))
+                    arrival = next_arrival()
+            stats["makespan"] = loop.time() - started
+        run["next_round"] = run["rounds"] + 1
+        completed = True
+    finally:
+        finish_run(run, completed)
+    return stats
+
+
+def racing_replies(run):
+    """與其他回覆賽跑的留言數：送出時還沒看到在它之前寫入的所有留言"""
+    return sum(1 for h in run["history"].posts() if "seen" in h and h["seen"] < h["round"] - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moltbook 離散事件模式（多則留言同時在途）")
+    parser.add_argument("--version", default="v3", choices=sorted(VERSIONS), help="實驗範式")
+    parser.add_argument("--rounds", type=int, default=None, help="請求數（預設沿用範式 ROUNDS；--trace 時為軌跡長度）")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Poisson 到達率（每秒）")
+    parser.add_argument("--trace", metavar="JSONL", help="軌跡檔（每行 {\"t\": 秒, \"agent\": 名稱}），取代 Poisson 到達")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="同時在途的請求上限")
+    parser.add_argument("--clock", choices=("sim", "real"), default="real", help="sim：模擬時鐘（可重現）；real：真實時鐘")
+    parser.add_argument("--seed", type=int, default=None, help="亂數種子（agent 抽籤、到達時刻與模擬延遲）")
+    parser.add_argument("--agents", type=int, default=None, help="agent 數（預設每個模型一個）")
+    parser.add_argument("--experiment-id", default=None, help="實驗編號（預設為目前時間）")
+    parser.add_argument("--no-reports", action="store_true", help="不輸出 markdown 紀錄")
+    parser.add_argument("--verbose", action="store_true", help="逐則顯示送出 / 完成與留言內容")
+    add_mock_argument(parser)
+    args = parser.parse_args()
+    apply_mock_argument(args)
+
+    strategy = get_strategy(args.version)
+    clock_rng = random.Random(None if args.seed is None else f"{args.seed}/clock")
+    if args.trace:
+        trace = load_trace(args.trace)
+        rounds = min(args.rounds or len(trace), len(trace))
+    else:
+        rounds = args.rounds or strategy.rounds
+
+    run = new_run(strategy, args.seed, args.experiment_id, rounds, agents=args.agents)
+    arrivals = trace if args.trace else poisson_arrivals(clock_rng, args.rate, rounds)
+
+    print("=" * 70)
+    print("⏱️ Moltbook 離散事件模式")
+    print("=" * 70)
+    print(f"📅 實驗編號: {run['experiment_id']}")
+    print(f"🔬 範式: {args.version}")
+    print(f"🕰️ 時鐘: {'模擬' if args.clock == 'sim' else '真實'}")
+    print(f"📥 到達: {f'軌跡 {args.trace}' if args.trace else f'Poisson {args.rate}/秒'} × {rounds} 個請求")
+    print(f"🚦 在途上限: {args.max_in_flight}")
+    if run["event_log"]:
+        print(f"🧾 事件紀錄: {run['event_log'].path}")
+    print("=" * 70)
+    print_dropped(strategy.dropped_models)
+
+    client = make_async_client(args.max_in_flight)
+    profile = (load_profile() or {}).get("models") if args.clock == "sim" else None
+    started = time.perf_counter()
+    stats = asyncio.run(run_events(
+        run, client, arrivals, args.clock, args.max_in_flight, clock_rng, profile, args.verbose,
+    ))
+    elapsed = time.perf_counter() - started
+
+    if not args.no_reports:
+        log_filename, report_filename = strategy.write_reports(run)
+        print(f"📄 對話紀錄: {log_filename}")
+        print(f"📊 分析報告: {report_filename}")
+
+    posts = len(run["history"]) - 1
+    makespan = stats["makespan"]
+    extra = strategy.summary_text(run)
+    print("\n" + "=" * 70)
+    print("📊 離散事件統計:")
+    print(f"   💬 留言: {posts}/{rounds}（失敗 {len(run['statistics']['model_failures'])} 次）")
+    print(f"   🏁 賽跑中的回覆: {racing_replies(run)} 則（送出時還沒看到前面已寫入的留言）")
+    print(f"   🕰️ {'模擬' if args.clock == 'sim' else '實際'}時長: {makespan:.1f} 秒（實際耗時 {elapsed:.1f} 秒）")
+    # 依序接龍的時長 ≈ 所有請求延遲總和，加速倍數即平均在途請求數
+    print(f"   🛫 平均在途請求: {stats['busy'] / makespan if makespan else 0:.1f}（最多 {stats['max_in_flight']}），"
+          f"依序接龍約需 {stats['busy']:.1f} 秒")
+    if extra:
+        print(f"   🧪 {extra}")
+    print_cache_stats(client)
+    print_connection_stats()
+    save_calibration()
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+===============================================================================
+Moltbook 連線層 - 共用、調校過的 OpenRouter HTTP 連線池
+===============================================================================
+
+原本每支腳本各自 OpenAI(...)，使用 SDK 預設的 httpx 設定：
+- keep-alive 只保留 5 秒，每輪之間的空檔就可能讓連線關掉，下一輪重新 TCP + TLS 握手
+- 連線池大小與實際併發數無關
+
+改為：
+- get_client() / get_async_client()：每個程序共用一個 client（單例）
+- 連線池大小跟著併發數（--concurrency / MOLTBOOK_MAX_CONNECTIONS）
+- 有安裝 h2 時啟用 HTTP/2，多個請求共用同一條連線
+- keep-alive 延長到 MOLTBOOK_KEEPALIVE 秒，批次 worker 跑下一場 replicate 時連線仍是熱的
+- 透過 httpcore 的 trace 擴充統計「新建連線 / TLS 握手 / 重用」次數
+
+離線測試：
+    python mock_openrouter.py &
+    python moltbook_chaos_experiment_v3.py --mock          # 改連 http://127.0.0.1:8765/api/v1
+
+設定（.env 或環境變數）：
+    MOLTBOOK_BASE_URL=https://openrouter.ai/api/v1
+    MOLTBOOK_MAX_CONNECTIONS=16
+    MOLTBOOK_KEEPALIVE=120
+    MOLTBOOK_HTTP2=0              # 停用 HTTP/2
+"""
+
+import importlib.util
+import os
+import threading
+
+from dotenv import load_dotenv
+from openai import DEFAULT_CONNECTION_LIMITS, AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from moltbook_cache import maybe_cached
+
+load_dotenv()
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+MOCK_BASE_URL = "http://127.0.0.1:8765/api/v1"
+BASE_URL = os.getenv("MOLTBOOK_BASE_URL", OPENROUTER_BASE_URL)
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("MOLTBOOK_MAX_CONNECTIONS", 16))
+KEEPALIVE_SECONDS = float(os.getenv("MOLTBOOK_KEEPALIVE", 120))
+
+
+def http2_available():
+    """HTTP/2 需要 h2 套件（pip install h2）；MOLTBOOK_HTTP2=0 可強制停用"""
+    if os.getenv("MOLTBOOK_HTTP2", "1") == "0":
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+class ConnectionStats:
+    """
+    依 httpcore trace 事件計數：
+    - requests：送出的請求數
+    - connections：新建的 TCP 連線數
+    - tls_handshakes：TLS 握手次數
+    - reused：沿用既有連線的請求數（= requests - connections）
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self._lock = threading.Lock()
+
+    def on_event(self, name, info):
+        with self._lock:
+            if name.endswith("send_request_headers.started"):
+                self.requests += 1
+            elif name == "connection.connect_tcp.complete":
+                self.connections += 1
+            elif name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(0, self.requests - self.connections)
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+            }
+
+
+STATS = ConnectionStats()
+
+_client = None
+_async_client = None
+_async_raw_client = None
+_lock = threading.Lock()
+
+
+def _limits(max_connections):
+    # 與 SDK 預設值同型別（openai 1.x 為 httpx.Limits、3.x 為 httpx2.Limits），不直接依賴 httpx
+    return type(DEFAULT_CONNECTION_LIMITS)(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=KEEPALIVE_SECONDS,
+    )
+
+
+def _trace(name, info):
+    STATS.on_event(name, info)
+
+
+async def _trace_async(name, info):
+    STATS.on_event(name, info)
+
+
+def _attach_trace(request):
+    request.extensions["trace"] = _trace
+
+
+async def _attach_trace_async(request):
+    request.extensions["trace"] = _trace_async
+
+
+def _api_key():
+    # mock 伺服器不檢查金鑰，但 SDK 要求一定要有值
+    key = os.getenv("OPEN_ROUTER_KEY")
+    if not key and BASE_URL != OPENROUTER_BASE_URL:
+        return "mock"
+    return key
+
+
+def use_base_url(url):
+    """
+    切換 API 端點（例如本機 mock），之後的 get_client() 會重新建立 client
+    同時寫入環境變數，讓批次 worker 程序也連到同一個端點
+    """
+    global BASE_URL, _client, _async_client, _async_raw_client
+    with _lock:
+        BASE_URL = url
+        os.environ["MOLTBOOK_BASE_URL"] = url
+        _client = None
+        _async_client = None
+        _async_raw_client = None
+
+
+def add_mock_argument(parser):
+    parser.add_argument(
+        "--mock", nargs="?", const=MOCK_BASE_URL, default=None, metavar="URL",
+        help=f"改連本機 mock_openrouter.py（預設 {MOCK_BASE_URL}）",
+    )
+
+
+def apply_mock_argument(args):
+    if args.mock:
+        use_base_url(args.mock)
+        print(f"🧪 Mock 模式: {args.mock}")
+
+
+def get_client(max_connections=None):
+    """
+    同步 OpenAI client 單例（含 MOLTBOOK_CACHE 快取包裝）
+    重試交給 moltbook_ratelimit，因此 max_retries=0
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            http_client = DefaultHttpxClient(
+                limits=_limits(max_connections or DEFAULT_MAX_CONNECTIONS),
+                http2=http2_available(),
+                event_hooks={"request": [_attach_trace]},
+            )
+            _client = maybe_cached(OpenAI(
+                base_url=BASE_URL,
+                api_key=_api_key(),
+                max_retries=0,
+                http_client=http_client,
+            ))
+        return _client
+
+
+def get_async_client(max_connections=None, cached=True):
+    """
+    AsyncOpenAI client 單例；連線池大小通常設為 --concurrency
+    cached=False 時回傳不經 MOLTBOOK_CACHE 的 client（共用同一個連線池），給自帶結果快取的評審使用
+    注意：連線綁定在第一個使用它的 event loop 上，同一程序只應在一個 asyncio.run 內使用
+    """
+    global _async_client, _async_raw_client
+    with _lock:
+        if _async_raw_client is None:
+            http_client = DefaultAsyncHttpxClient(
+                limits=_limits(max_connections or DEFAULT_MAX_CONNECTIONS),
+                http2=http2_available(),
+                event_hooks={"request": [_attach_trace_async]},
+            )
+            _async_raw_client = AsyncOpenAI(
+                base_url=BASE_URL,
+                api_key=_api_key(),
+                max_retries=0,
+                http_client=http_client,
+            )
+            _async_client = maybe_cached(_async_raw_client)
+        return _async_client if cached else _async_raw_client
+
+
+def connection_stats():
+    return STATS.snapshot()
+
+
+def print_connection_stats():
+    stats = STATS.snapshot()
+    if not stats["requests"]:
+        return
+    print(f"   🔌 連線: {stats['requests']} 個請求 / {stats['connections']} 條新連線 / "
+          f"{stats['tls_handshakes']} 次 TLS 握手，重用率 {stats['reuse_rate']:.1%}"
+          f"{'（HTTP/2）' if http2_available() else ''}")
@@ -1,17 +1,28 @@
 """
-測試所有模型是否可用
+測試所有模型是否可用，並量測延遲與生成速度
+
+- 併發探測：所有模型、每個模型多次取樣同時進行（--concurrency 限制在途請求數）
+- 以串流請求量測首 token 延遲（TTFT）、總延遲與 tokens/秒，輸出 P50 / P90
+- 探測一律實際送出：串流請求不經過回應快取（MOLTBOOK_CACHE），否則量到的是快取而不是模型
+- 結果寫入 moltbook_model_profile.json（含 TTL），實驗腳本啟動時據此剔除
+  不存在（dead）或太慢（slow）的模型，而不是跑到一半才發現
+
+    python test_models.py                        # 連線 OpenRouter
+    python test_models.py --samples 5 --ttl 12
+    python test_models.py --mock                 # 連線本機 mock_openrouter.py
 """
 
-import os
+import argparse
+import asyncio
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
 
-load_dotenv()
+from moltbook_api import LIMITER
+from moltbook_profile import DEFAULT_TTL_HOURS, classify, save_profile
+from moltbook_ratelimit import status_of
+from moltbook_transport import add_mock_argument, apply_mock_argument, get_async_client, print_connection_stats
 
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPEN_ROUTER_KEY"),
-)
+load_dotenv()
 
 # 所有待測試的模型
 MODELS = [
@@ -44,62 +55,137 @@ MODELS = [
     "microsoft/wizardlm-2-8x22b",
 ]
 
-print("🔍 開始測試模型...\n")
-print("=" * 70)
+PROBE_MESSAGES = [{"role": "user", "content": "用一句話向大家打招呼。"}]
+PROBE_MAX_TOKENS = 32
 
-working_models = []
-failed_models = []
 
-for i, model in enumerate(MODELS, 1):
-    print(f"\n[{i}/{len(MODELS)}] 測試: {model}")
-    
+async def _stream_probe(client, model, sample, started):
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=PROBE_MESSAGES,
+        max_tokens=PROBE_MAX_TOKENS,
+        temperature=0.3,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    chunks = 0
+    usage = None
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "user", "content": "Hi"}
-            ],
-            max_tokens=5,
-            temperature=0.3,
-        )
-        
-        content = response.choices[0].message.content
-        print(f"  ✅ 成功: {content[:30]}...")
-        working_models.append(model)
-        
-    except Exception as e:
-        error_msg = str(e)
-        if "404" in error_msg:
-            print(f"  ❌ 失敗 (404): 模型不存在或不可用")
-        elif "429" in error_msg:
-            print(f"  ⏳ 失敗 (429): Rate limit (可能臨時性)")
-        else:
-            print(f"  ❌ 失敗: {error_msg[:80]}")
-        
-        failed_models.append((model, error_msg))
-
-print("\n" + "=" * 70)
-print("\n📊 測試結果:")
-print(f"  ✅ 可用模型: {len(working_models)} 個")
-print(f"  ❌ 失敗模型: {len(failed_models)} 個")
-
-if working_models:
-    print("\n✅ 可用模型清單:")
-    for model in working_models:
-        print(f"  - {model}")
-
-if failed_models:
-    print("\n❌ 失敗模型清單:")
-    for model, error in failed_models:
-        if "404" in error:
-            print(f"  - {model} (404 - 不存在)")
-        elif "429" in error:
-            print(f"  - {model} (429 - Rate limit)")
-        else:
-            print(f"  - {model} (其他錯誤)")
-
-print("\n" + "=" * 70)
-print(f"\n最終可用模型數量: {len(working_models)}/20")
-
-if len(working_models) < 20:
-    print(f"\n⚠️ 需要替換 {20 - len(working_models)} 個模型")
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if sample["ttft"] is None:
+                sample["ttft"] = time.perf_counter() - started
+            sample["text"] += chunk.choices[0].delta.content
+            chunks += 1
+    finally:
+        await stream.close()
+    return usage.completion_tokens if usage else chunks
+
+
+async def probe_once(client, semaphore, model, timeout):
+    """
+    送出一次串流探測，回傳單筆樣本：
+    {"ok", "status", "error", "ttft", "latency", "tps", "tokens", "text"}
+    """
+    sample = {"ok": False, "status": None, "error": None, "ttft": None,
+              "latency": None, "tps": None, "tokens": 0, "text": ""}
+    async with semaphore:
+        await LIMITER.acquire_async(model)
+        started = time.perf_counter()
+        try:
+            sample["tokens"] = await asyncio.wait_for(_stream_probe(client, model, sample, started), timeout)
+        except Exception as e:
+            sample["status"] = status_of(e)
+            sample["error"] = str(e) or type(e).__name__
+            return sample
+
+    sample["latency"] = time.perf_counter() - started
+    generating = sample["latency"] - (sample["ttft"] or 0)
+    if sample["tokens"] and generating > 0:
+        sample["tps"] = sample["tokens"] / generating
+    sample["ok"] = True
+    return sample
+
+
+async def probe_models(models, samples, concurrency, timeout):
+    """所有模型 × samples 次探測同時進行，回傳 {model: [sample, ...]}"""
+    client = get_async_client(max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = {
+        model: [asyncio.ensure_future(probe_once(client, semaphore, model, timeout)) for _ in range(samples)]
+        for model in models
+    }
+    return {model: list(await asyncio.gather(*futures)) for model, futures in tasks.items()}
+
+
+def _fmt(value, pattern="{:.2f}"):
+    return "—" if value is None else pattern.format(value)
+
+
+def print_results(profile):
+    print(f"\n{'模型':<44} {'狀態':<13} {'成功':>5} {'TTFT p50/p90 (s)':>17} {'延遲 p50/p90 (s)':>17} {'tok/s p50':>9}")
+    print("-" * 110)
+    for model, summary in sorted(profile.items(), key=lambda x: (x[1]["status"] != "ok", x[1]["latency_p50"] or 1e9)):
+        status_emoji = {"ok": "✅", "slow": "🐢", "rate_limited": "⏳", "dead": "❌"}[summary["status"]]
+        print(f"{model:<44} {status_emoji} {summary['status']:<11} "
+              f"{summary['ok']:>2}/{summary['samples']:<2} "
+              f"{_fmt(summary['ttft_p50']):>8}/{_fmt(summary['ttft_p90']):<8} "
+              f"{_fmt(summary['latency_p50']):>8}/{_fmt(summary['latency_p90']):<8} "
+              f"{_fmt(summary['tps_p50'], '{:.1f}'):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="測試所有模型是否可用，並量測延遲與生成速度")
+    parser.add_argument("--models", nargs="+", default=None, help="只測試指定模型（預設為完整清單）")
+    parser.add_argument("--samples", type=int, default=3, help="每個模型的取樣次數")
+    parser.add_argument("--concurrency", type=int, default=16, help="同時在途的探測請求上限")
+    parser.add_argument("--timeout", type=float, default=60.0, help="單次探測逾時秒數")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL_HOURS, help="探測結果有效時數")
+    parser.add_argument("--no-save", action="store_true", help="不寫入 moltbook_model_profile.json")
+    add_mock_argument(parser)
+    args = parser.parse_args()
+    apply_mock_argument(args)
+
+    models = args.models or MODELS
+    print("🔍 開始測試模型...")
+    print(f"   {len(models)} 個模型 × {args.samples} 次取樣，併發上限 {args.concurrency}")
+    print("=" * 70)
+
+    started = time.perf_counter()
+    results = asyncio.run(probe_models(models, args.samples, args.concurrency, args.timeout))
+    elapsed = time.perf_counter() - started
+
+    profile = {}
+    for model, samples in results.items():
+        _, summary = classify(samples)
+        errors = [s["error"] for s in samples if not s["ok"]]
+        if errors:
+            summary["last_error"] = errors[-1][:200]
+        profile[model] = summary
+
+    print_results(profile)
+
+    working_models = [m for m, s in profile.items() if s["status"] == "ok"]
+    failed_models = [(m, s) for m, s in profile.items() if s["status"] != "ok"]
+
+    print("\n" + "=" * 70)
+    print("\n📊 測試結果:")
+    print(f"  ✅ 可用模型: {len(working_models)} 個")
+    print(f"  ❌ 其他狀態: {len(failed_models)} 個")
+    for model, summary in failed_models:
+        errors = ", ".join(f"{code}×{n}" for code, n in summary["errors"].items()) or "—"
+        print(f"  - {model} ({summary['status']}，錯誤: {errors})")
+
+    print(f"\n最終可用模型數量: {len(working_models)}/{len(models)}")
+    print(f"⏱️ 探測耗時: {elapsed:.1f} 秒")
+    print_connection_stats()
+
+    if not args.no_save:
+        path = save_profile(profile, args.ttl)
+        print(f"🩺 探測結果已寫入 {path}（{args.ttl:g} 小時內有效，實驗腳本會自動剔除 dead / slow 模型）")
+
+
+if __name__ == "__main__":
+    main()